@@ -21,6 +21,7 @@ DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN", "")
 DISCORD_ENABLED = os.getenv("DISCORD_ENABLED", "true").lower() == "true"
 NATS_SUBJECT = "todos"
 QUEUE_GROUP = "broadcasters"  # Queue group ensures only one subscriber processes each message
+BATCH_PREVIEW_SIZE = int(os.getenv("BATCH_PREVIEW_SIZE", "10"))
 
 
 async def send_discord_message(message: str):
@@ -50,6 +51,28 @@ async def send_discord_message(message: str):
         return False
 
 
+def format_batch_message(action: str, todos: list, timestamp: str) -> str:
+    """Build a single Discord message summarising a batch event"""
+    emoji = "📦"
+    action_text = f"{len(todos)} TODOS {action.upper()}"
+    # Discord caps messages at 2000 characters, so only list the first few
+    shown = todos[:BATCH_PREVIEW_SIZE]
+    lines = [
+        f"**#{todo.get('id', '?')}** {'✅' if todo.get('done') else '⏳'} {todo.get('todo', '')}"
+        for todo in shown
+    ]
+    if len(todos) > len(shown):
+        lines.append(f"... and {len(todos) - len(shown)} more")
+    body = "\n".join(lines)
+    return f"""
+{emoji} **{action_text}** {emoji}
+━━━━━━━━━━━━━━━━━━━━━
+{body}
+**Timestamp:** {timestamp}
+━━━━━━━━━━━━━━━━━━━━━
+""".strip()
+
+
 async def message_handler(msg):
     """Handle incoming NATS messages"""
     try:
@@ -58,6 +81,17 @@ async def message_handler(msg):
         todo = data.get("todo", {})
         timestamp = data.get("timestamp", "N/A")
         
+        # Bulk endpoints publish one event carrying a list of todos
+        if "todos" in data:
+            todos = data.get("todos", [])
+            message = format_batch_message(action, todos, timestamp)
+            logger.info(f"Received {action} event for {len(todos)} todos")
+            if DISCORD_ENABLED:
+                await send_discord_message(message)
+            else:
+                logger.info(f"[LOG ONLY MODE] Would send to Discord:\n{message}")
+            return
+        
         todo_id = todo.get("id", "?")
         todo_text = todo.get("todo", "")
         done_status = todo.get("done", False)
@@ -69,6 +103,9 @@ async def message_handler(msg):
         elif action == "updated":
             emoji = "✅" if done_status else "🔄"
             action_text = "TODO MARKED COMPLETE" if done_status else "TODO REOPENED"
+        elif action == "deleted":
+            emoji = "🗑️"
+            action_text = "TODO DELETED"
         else:
             emoji = "ℹ️"
             action_text = f"TODO ACTION: {action.upper()}"
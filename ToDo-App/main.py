@@ -1,12 +1,20 @@
 import os
 import time
+import socket
+import asyncio
+import collections
+import io
+import gzip
+import hashlib
+import brotli
 import httpx
 import uvicorn
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pathlib import Path
-
-app = FastAPI(title="ToDo App")
+from PIL import Image, features
 
 # Configuration from environment variables
 IMAGE_DIR = Path(os.getenv("IMAGE_DIR", "/usr/src/app/images"))
@@ -16,6 +24,96 @@ CACHE_DURATION = int(os.getenv("CACHE_DURATION", "600"))  # seconds
 IMAGE_URL = os.getenv("IMAGE_URL", "https://picsum.photos/1200")
 BACKEND_URL = os.getenv("BACKEND_URL", "http://todo-backend-svc:80")
 
+# Image refresh configuration; the lock file keeps pods sharing IMAGE_DIR
+# from all fetching at once
+IMAGE_LOCK_FILE = IMAGE_DIR / "refresh.lock"
+IMAGE_REFRESH_LOCK = os.getenv("IMAGE_REFRESH_LOCK", "true").lower() == "true"
+IMAGE_LOCK_TIMEOUT = float(os.getenv("IMAGE_LOCK_TIMEOUT", "120"))  # seconds before a crashed pod's lock is broken
+IMAGE_RETRY_INTERVAL = float(os.getenv("IMAGE_RETRY_INTERVAL", "30"))  # seconds to wait after a refresh did not succeed
+refresh_task = None
+last_refresh_failure = 0
+current_image = None  # CachedImage; the files in IMAGE_DIR only persist it across restarts
+
+# Front end assets, pre-rendered and pre-compressed once at startup
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+STATIC_HASHED_FILES = ["app.css", "app.js"]
+static_assets = {}  # URL name -> StaticAsset
+
+# Image variant configuration; every refresh renders the image at each width
+# in each format, and /image serves the smallest one that fits the client
+IMAGE_WIDTHS = sorted(int(width) for width in os.getenv("IMAGE_WIDTHS", "400,800").split(","))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "70"))
+# Most preferred first; AVIF needs a Pillow build with libavif
+IMAGE_FORMATS = [fmt for fmt in ("avif", "webp") if features.check(fmt)] + ["jpeg"]
+MEDIA_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+image_variants = []  # CachedImage renditions of current_image
+
+# Shared HTTP client configuration
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # seconds
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))  # seconds
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))  # seconds for read/write/pool
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))  # seconds
+http_client = None
+
+# Backend proxy configuration for /todos
+PROXY_CACHE_TTL = float(os.getenv("PROXY_CACHE_TTL", "1"))  # seconds, 0 disables the micro-cache
+PROXY_CACHE_MAX_ENTRIES = int(os.getenv("PROXY_CACHE_MAX_ENTRIES", "256"))
+PROXY_RESPONSE_HEADERS = ("content-type", "etag", "cache-control", "x-next-cursor", "x-next-offset")
+PROXY_STREAM_HEADERS = PROXY_RESPONSE_HEADERS + ("content-encoding", "x-accel-buffering")
+# Relayed streams (SSE, NDJSON) hold a connection for as long as the client
+# listens, so they get their own client and a cap; beyond it /todos/events
+# answers 503 instead of starving the shared pool
+PROXY_MAX_STREAMS = int(os.getenv("PROXY_MAX_STREAMS", "1000"))
+backend_proxy = None
+stream_client = None
+active_streams = 0
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open the shared HTTP client and start the first image refresh on startup"""
+    global http_client, stream_client, backend_proxy
+    # One pooled client keeps connections alive across requests; HTTP/2 is
+    # negotiated over TLS (picsum) and HTTP/1.1 is used for plain http
+    http_client = httpx.AsyncClient(
+        http2=HTTP2_ENABLED,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+    )
+    # Sized to PROXY_MAX_STREAMS so an admitted stream never waits for a connection
+    stream_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=PROXY_MAX_STREAMS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, read=None),
+    )
+    backend_proxy = BackendProxy(PROXY_CACHE_TTL, PROXY_CACHE_MAX_ENTRIES)
+    static_assets.update(build_static_assets())
+    ensure_image_dir()
+    await asyncio.to_thread(load_image_from_disk)
+    schedule_image_refresh()
+    try:
+        yield
+    finally:
+        if refresh_task is not None:
+            refresh_task.cancel()
+            await asyncio.gather(refresh_task, return_exceptions=True)
+        await stream_client.aclose()
+        await http_client.aclose()
+
+
+app = FastAPI(title="ToDo App", lifespan=lifespan)
+
 
 def ensure_image_dir():
     """Ensure the image directory exists"""
@@ -30,320 +128,469 @@ def get_cached_timestamp():
         return 0
 
 
-def save_timestamp():
-    """Save current timestamp"""
-    TIMESTAMP_FILE.write_text(str(time.time()))
+def save_timestamp(timestamp):
+    """Save the fetch timestamp"""
+    TIMESTAMP_FILE.write_text(str(timestamp))
+
+
+class CachedImage:
+    """Image bytes held in memory with their content hash and fetch time"""
+
+    def __init__(self, content: bytes, fetched_at: float, format="jpeg", width=None):
+        self.content = content
+        self.fetched_at = fetched_at
+        self.format = format
+        self.width = width
+        self.media_type = MEDIA_TYPES[format]
+        self.etag = f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+    def max_age(self):
+        """Seconds until CACHE_DURATION runs out, so browsers revalidate after a refresh"""
+        return max(0, int(self.fetched_at + CACHE_DURATION - time.time()))
+
+
+def write_atomically(path, content):
+    """Write beside the target and rename, so readers never see a partial file"""
+    partial = path.with_name(f"{path.name}.{socket.gethostname()}.tmp")
+    partial.write_bytes(content)
+    os.replace(partial, path)
+
+
+def variant_path(width, fmt):
+    return IMAGE_DIR / f"daily_image-{width}.{fmt}"
+
+
+def variant_specs(original_width):
+    """(width, format) of every rendition; the original itself stands in for full-size JPEG"""
+    widths = [width for width in IMAGE_WIDTHS if width < original_width] + [original_width]
+    return [(width, fmt) for width in widths for fmt in IMAGE_FORMATS
+            if (width, fmt) != (original_width, "jpeg")]
+
+
+def build_variants(content, fetched_at):
+    """Render the resized and re-encoded variants of an image; CPU bound, run it in a thread"""
+    with Image.open(io.BytesIO(content)) as original:
+        original = original.convert("RGB")
+        variants = [CachedImage(content, fetched_at, "jpeg", original.width)]
+        for width, fmt in variant_specs(original.width):
+            if width == original.width:
+                resized = original
+            else:
+                resized = original.resize((width, round(original.height * width / original.width)), Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, format=fmt.upper(), quality=IMAGE_QUALITY)
+            variants.append(CachedImage(buffer.getvalue(), fetched_at, fmt, width))
+    return variants
+
+
+def read_variants(content, fetched_at):
+    """Read the variants persisted beside an image; None if any is missing"""
+    with Image.open(io.BytesIO(content)) as original:
+        original_width = original.width
+    variants = [CachedImage(content, fetched_at, "jpeg", original_width)]
+    for width, fmt in variant_specs(original_width):
+        try:
+            variants.append(CachedImage(variant_path(width, fmt).read_bytes(), fetched_at, fmt, width))
+        except FileNotFoundError:
+            return None
+    return variants
+
+
+def persist_image(variants, fetched_at):
+    """Write the variants, then the original and its timestamp
+
+    A fresh timestamp therefore means every variant is already on disk.
+    """
+    original = variants[0]
+    for variant in variants[1:]:
+        write_atomically(variant_path(variant.width, variant.format), variant.content)
+    write_atomically(IMAGE_FILE, original.content)
+    save_timestamp(fetched_at)
+
+
+def load_image_from_disk():
+    """Load the persisted image and its variants into memory; False if there is none"""
+    global current_image, image_variants
+    try:
+        content = IMAGE_FILE.read_bytes()
+    except FileNotFoundError:
+        return False
+    fetched_at = get_cached_timestamp()
+    if current_image is not None and fetched_at <= current_image.fetched_at:
+        return True
+    try:
+        variants = read_variants(content, fetched_at) or build_variants(content, fetched_at)
+    except OSError as e:
+        print(f"Error loading image variants: {e}")
+        variants = [CachedImage(content, fetched_at)]
+    current_image, image_variants = variants[0], variants
+    return True
 
 
 def is_image_expired():
-    """Check if the cached image is older than 10 minutes"""
-    cached_time = get_cached_timestamp()
-    return (time.time() - cached_time) > CACHE_DURATION
+    """Check if the image in memory is missing or older than CACHE_DURATION"""
+    return current_image is None or (time.time() - current_image.fetched_at) > CACHE_DURATION
 
 
-def fetch_new_image():
+async def fetch_new_image():
     """Fetch a new random image from Lorem Picsum"""
+    global current_image, image_variants
     try:
         print(f"Fetching new image from {IMAGE_URL}...")
-        with httpx.Client(follow_redirects=True, timeout=30.0) as client:
-            response = client.get(IMAGE_URL)
-            response.raise_for_status()
-            IMAGE_FILE.write_bytes(response.content)
-            save_timestamp()
-            print("New image cached successfully")
-            return True
+        response = await http_client.get(IMAGE_URL)
+        response.raise_for_status()
+        fetched_at = time.time()
+        variants = await asyncio.to_thread(build_variants, response.content, fetched_at)
+        await asyncio.to_thread(persist_image, variants, fetched_at)
+        current_image, image_variants = variants[0], variants
+        print(f"New image cached successfully ({response.http_version}, {len(variants)} variants)")
+        return True
     except Exception as e:
         print(f"Error fetching image: {e}")
         return False
 
 
-def get_or_refresh_image():
-    """Get cached image or fetch new one if expired"""
-    ensure_image_dir()
-    
-    # If image doesn't exist, fetch it
-    if not IMAGE_FILE.exists():
-        fetch_new_image()
-        return
-    
-    # If image is expired, fetch new one
-    if is_image_expired():
-        fetch_new_image()
+def acquire_refresh_lock():
+    """Take the refresh lock on the shared volume; False if another pod holds it"""
+    for _ in range(2):
+        try:
+            fd = os.open(IMAGE_LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                age = time.time() - IMAGE_LOCK_FILE.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if age < IMAGE_LOCK_TIMEOUT:
+                return False
+            print(f"Breaking image refresh lock left {age:.0f}s ago")
+            IMAGE_LOCK_FILE.unlink(missing_ok=True)
+            continue
+        os.write(fd, socket.gethostname().encode())
+        os.close(fd)
+        return True
+    return False
+
+
+async def refresh_image():
+    """Fetch a new image unless another pod is already doing it"""
+    global last_refresh_failure
+    refreshed = await refresh_image_locked()
+    if not refreshed:
+        last_refresh_failure = time.time()
+    return refreshed
+
+
+async def refresh_image_locked():
+    """Fetch under the cross-pod lock; False if the fetch failed or the lock is taken"""
+    if IMAGE_REFRESH_LOCK:
+        try:
+            if not acquire_refresh_lock():
+                print("Image refresh already in progress in another pod")
+                return False
+        except OSError as e:
+            print(f"Error taking image refresh lock: {e}")
+            return False
+    try:
+        # Another pod sharing IMAGE_DIR may have refreshed the image already
+        if time.time() - get_cached_timestamp() <= CACHE_DURATION:
+            if await asyncio.to_thread(load_image_from_disk):
+                print("Loaded image refreshed by another pod")
+                return True
+        return await fetch_new_image()
+    finally:
+        if IMAGE_REFRESH_LOCK:
+            IMAGE_LOCK_FILE.unlink(missing_ok=True)
+
+
+def schedule_image_refresh():
+    """Start a background refresh if the image is missing or stale
+
+    At most one refresh runs per process; the running task is returned so
+    callers with nothing to serve can wait for it.
+    """
+    global refresh_task
+    if refresh_task is not None and not refresh_task.done():
+        return refresh_task
+    if not is_image_expired():
+        return None
+    if time.time() - last_refresh_failure < IMAGE_RETRY_INTERVAL:
+        return None
+    refresh_task = asyncio.create_task(refresh_image())
+    return refresh_task
+
+
+async def get_or_refresh_image():
+    """Serve the cached image as is, refreshing it in the background when stale
+
+    Only a missing image makes the request wait, for the refresh in flight.
+    """
+    task = schedule_image_refresh()
+    if task is not None and current_image is None:
+        await asyncio.shield(task)
+
+
+def etag_matches(if_none_match, etag):
+    """Evaluate an If-None-Match header against an ETag"""
+    if if_none_match is None:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def choose_variant(accept, width):
+    """Pick the narrowest variant at least width wide, in the most preferred format the client accepts
+
+    Without a width hint, or one wider than every variant, the full-size image
+    is chosen; JPEG is always acceptable.
+    """
+    # Only types named explicitly count; */* alone does not promise AVIF or WebP support
+    accepted = accepted_values(accept)
+    formats = [fmt for fmt in IMAGE_FORMATS if fmt == "jpeg" or MEDIA_TYPES[fmt] in accepted]
+    variants = [variant for variant in image_variants if variant.format in formats]
+    if not variants:
+        return current_image
+    wide_enough = [variant.width for variant in variants if width is not None and variant.width >= width]
+    target = min(wide_enough) if wide_enough else max(variant.width for variant in variants)
+    return min(
+        (variant for variant in variants if variant.width == target),
+        key=lambda variant: formats.index(variant.format),
+    )
+
+
+def accepted_values(header):
+    """Values named in an Accept or Accept-Encoding header, minus those refused with q=0"""
+    values = set()
+    for part in (header or "").lower().split(","):
+        value, *params = part.split(";")
+        try:
+            refused = any(
+                name.strip() == "q" and float(q) == 0
+                for name, _, q in (param.partition("=") for param in params)
+            )
+        except ValueError:
+            continue
+        if not refused and value.strip():
+            values.add(value.strip())
+    return values
+
+
+class StaticAsset:
+    """A front end file kept in memory as identity, gzip and brotli bodies"""
+
+    def __init__(self, content: bytes, media_type: str, cache_control: str):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.digest = hashlib.sha256(content).hexdigest()[:16]
+        # Most preferred coding first; each coding has its own strong ETag
+        self.bodies = [
+            ("br", brotli.compress(content, quality=11)),
+            ("gzip", gzip.compress(content, compresslevel=9, mtime=0)),
+            ("identity", content),
+        ]
+
+    def response(self, accept_encoding, if_none_match):
+        encodings = accepted_values(accept_encoding)
+        coding, body = next(
+            (coding, body) for coding, body in self.bodies
+            if coding == "identity" or coding in encodings or "*" in encodings
+        )
+        etag = f'"{self.digest}-{coding}"'
+        headers = {"ETag": etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        if coding != "identity":
+            headers["Content-Encoding"] = coding
+        return Response(content=body, media_type=self.media_type, headers=headers)
+
+
+def build_static_assets():
+    """Load the page, CSS and JS, and link the page to content-hashed asset URLs"""
+    media_types = {".html": "text/html; charset=utf-8", ".css": "text/css; charset=utf-8", ".js": "text/javascript; charset=utf-8"}
+    assets = {}
+    page = (STATIC_DIR / "index.html").read_text()
+    for name in STATIC_HASHED_FILES:
+        path = STATIC_DIR / name
+        content = path.read_bytes()
+        # Unhashed URLs keep working but must be revalidated
+        assets[name] = StaticAsset(content, media_types[path.suffix], "no-cache")
+        hashed = f"{path.stem}.{assets[name].digest}{path.suffix}"
+        assets[hashed] = StaticAsset(content, media_types[path.suffix], "public, max-age=31536000, immutable")
+        page = page.replace(f"/static/{name}", f"/static/{hashed}")
+    assets["index.html"] = StaticAsset(page.encode(), media_types[".html"], "no-cache")
+    return assets
 
 
 @app.get("/image")
-async def get_image():
-    """Serve the cached image"""
-    get_or_refresh_image()
+async def get_image(
+    w: Optional[int] = Query(None, ge=1, le=10000),
+    accept: Optional[str] = Header(None),
+    sec_ch_width: Optional[int] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Serve the best-fitting image variant from memory, answering 304 when the browser already has it
+
+    The width hint comes from the w query parameter or the Sec-CH-Width client hint.
+    """
+    await get_or_refresh_image()
     
-    if IMAGE_FILE.exists():
-        return FileResponse(IMAGE_FILE, media_type="image/jpeg")
-    else:
+    if current_image is None:
         return HTMLResponse(content="<p>Image not available</p>", status_code=503)
+    image = choose_variant(accept, w if w is not None else sec_ch_width)
+    headers = {
+        "ETag": image.etag,
+        "Cache-Control": f"public, max-age={image.max_age()}",
+        "Vary": "Accept, Sec-CH-Width",
+    }
+    if etag_matches(if_none_match, image.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=image.content, media_type=image.media_type, headers=headers)
 
 
 @app.get("/healthz")
 async def readiness_check():
     """Readiness probe - checks backend connectivity"""
     try:
-        with httpx.Client(timeout=5.0) as client:
-            response = client.get(f"{BACKEND_URL}/healthz")
-            response.raise_for_status()
+        response = await http_client.get(f"{BACKEND_URL}/healthz", timeout=HEALTH_CHECK_TIMEOUT)
+        response.raise_for_status()
         return {"status": "ready", "backend": "connected"}
     except Exception as e:
         print(f"Readiness check failed: {e}")
         raise HTTPException(status_code=500, detail=f"Backend connection failed: {e}")
 
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    # Ensure image is ready
-    get_or_refresh_image()
-    
-    html_content = """
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>ToDo App</title>
-        <style>
-            body {
-                font-family: sans-serif;
-                text-align: center;
-                padding: 20px;
-                max-width: 800px;
-                margin: 0 auto;
-                background-color: #f5f5f5;
-            }
-            img {
-                max-width: 400px;
-                width: 100%;
-                margin: 20px 0;
-                border-radius: 8px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            }
-            .todo-form {
-                margin: 20px 0;
-            }
-            .todo-form input[type="text"] {
-                width: 300px;
-                padding: 10px;
-                font-size: 16px;
-                border: 1px solid #ccc;
-                border-radius: 4px;
-            }
-            .todo-form button {
-                padding: 10px 20px;
-                font-size: 16px;
-                background-color: #007bff;
-                color: white;
-                border: none;
-                border-radius: 4px;
-                cursor: pointer;
-                margin-left: 10px;
-            }
-            .todo-form button:hover {
-                background-color: #0056b3;
-            }
-            .char-count {
-                font-size: 12px;
-                color: #666;
-                margin-top: 5px;
-            }
-            .todo-section {
-                text-align: left;
-                max-width: 500px;
-                margin: 20px auto;
-                background: white;
-                border-radius: 8px;
-                padding: 15px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            }
-            .todo-section h2 {
-                margin: 0 0 15px 0;
-                font-size: 18px;
-                color: #333;
-                border-bottom: 2px solid #007bff;
-                padding-bottom: 8px;
-            }
-            .todo-section.done h2 {
-                border-bottom-color: #28a745;
-            }
-            .todo-list {
-                list-style: none;
-                padding: 0;
-                margin: 0;
-            }
-            .todo-list li {
-                padding: 12px;
-                border-bottom: 1px solid #eee;
-                display: flex;
-                align-items: center;
-                gap: 10px;
-            }
-            .todo-list li:last-child {
-                border-bottom: none;
-            }
-            .todo-list li.done-item span {
-                text-decoration: line-through;
-                color: #888;
-            }
-            .todo-text {
-                flex: 1;
-                word-break: break-word;
-            }
-            .toggle-btn {
-                padding: 5px 12px;
-                font-size: 12px;
-                border: none;
-                border-radius: 4px;
-                cursor: pointer;
-                transition: all 0.2s;
-            }
-            .toggle-btn.mark-done {
-                background-color: #28a745;
-                color: white;
-            }
-            .toggle-btn.mark-done:hover {
-                background-color: #218838;
-            }
-            .toggle-btn.mark-undone {
-                background-color: #ffc107;
-                color: #333;
-            }
-            .toggle-btn.mark-undone:hover {
-                background-color: #e0a800;
-            }
-            .empty-message {
-                color: #888;
-                font-style: italic;
-                padding: 10px 0;
-            }
-        </style>
-    </head>
-    <body>
-        <h1>ToDo App</h1>
-        <img src="/image" alt="Daily image" />
-        
-        <div class="todo-form">
-            <input type="text" id="todoInput" maxlength="140" placeholder="Enter a todo (max 140 chars)" />
-            <button onclick="addTodo()">Send</button>
-            <div class="char-count"><span id="charCount">0</span>/140</div>
-        </div>
-        
-        <div class="todo-section">
-            <h2>Tasks</h2>
-            <ul class="todo-list" id="pendingList">
-                <li>Loading...</li>
-            </ul>
-        </div>
-        
-        <div class="todo-section done">
-            <h2>Done</h2>
-            <ul class="todo-list" id="doneList">
-                <li>Loading...</li>
-            </ul>
-        </div>
-        
-        <script>
-            const input = document.getElementById('todoInput');
-            const charCount = document.getElementById('charCount');
-            const pendingList = document.getElementById('pendingList');
-            const doneList = document.getElementById('doneList');
-            
-            input.addEventListener('input', function() {
-                charCount.textContent = this.value.length;
-            });
-            
-            async function fetchTodos() {
-                try {
-                    const response = await fetch('/todos');
-                    const todos = await response.json();
-                    renderTodos(todos);
-                } catch (error) {
-                    console.error('Error fetching todos:', error);
-                    pendingList.innerHTML = '<li class="empty-message">Error loading todos</li>';
-                    doneList.innerHTML = '<li class="empty-message">Error loading todos</li>';
-                }
-            }
-            
-            function renderTodos(todos) {
-                const pending = todos.filter(t => !t.done);
-                const done = todos.filter(t => t.done);
-                
-                if (pending.length === 0) {
-                    pendingList.innerHTML = '<li class="empty-message">No pending tasks. Add one!</li>';
-                } else {
-                    pendingList.innerHTML = pending.map(t => `
-                        <li>
-                            <span class="todo-text">${escapeHtml(t.todo)}</span>
-                            <button class="toggle-btn mark-done" onclick="toggleDone(${t.id}, true)">Done</button>
-                        </li>
-                    `).join('');
-                }
-                
-                if (done.length === 0) {
-                    doneList.innerHTML = '<li class="empty-message">No completed tasks yet.</li>';
-                } else {
-                    doneList.innerHTML = done.map(t => `
-                        <li class="done-item">
-                            <span class="todo-text">${escapeHtml(t.todo)}</span>
-                            <button class="toggle-btn mark-undone" onclick="toggleDone(${t.id}, false)">Undo</button>
-                        </li>
-                    `).join('');
-                }
-            }
-            
-            function escapeHtml(text) {
-                const div = document.createElement('div');
-                div.textContent = text;
-                return div.innerHTML;
-            }
-            
-            async function toggleDone(id, done) {
-                try {
-                    const response = await fetch(`/todos/${id}`, {
-                        method: 'PUT',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({ done: done })
-                    });
-                    if (response.ok) {
-                        fetchTodos();
-                    }
-                } catch (error) {
-                    console.error('Error updating todo:', error);
-                }
-            }
-            
-            async function addTodo() {
-                const value = input.value.trim();
-                if (value && value.length <= 140) {
-                    try {
-                        const response = await fetch('/todos', {
-                            method: 'POST',
-                            headers: { 'Content-Type': 'application/json' },
-                            body: JSON.stringify({ todo: value })
-                        });
-                        if (response.ok) {
-                            input.value = '';
-                            charCount.textContent = '0';
-                            fetchTodos();
-                        }
-                    } catch (error) {
-                        console.error('Error creating todo:', error);
-                    }
-                }
-            }
-            
-            // Load todos on page load
-            fetchTodos();
-        </script>
-    </body>
-    </html>
+@app.get("/static/{name}")
+async def get_static(name: str, accept_encoding: Optional[str] = Header(None), if_none_match: Optional[str] = Header(None)):
+    """Serve a stylesheet or script; content-hashed names are cached for a year"""
+    asset = static_assets.get(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return asset.response(accept_encoding, if_none_match)
+
+
+@app.get("/")
+async def root(accept_encoding: Optional[str] = Header(None), if_none_match: Optional[str] = Header(None)):
+    """Serve the pre-rendered page"""
+    # The page loads the image separately, so never wait for a refresh here
+    schedule_image_refresh()
+    return static_assets["index.html"].response(accept_encoding, if_none_match)
+
+
+
+class ProxiedResponse:
+    """A buffered backend response that can be handed to any number of clients"""
+
+    def __init__(self, response: httpx.Response):
+        self.status_code = response.status_code
+        self.headers = {name: response.headers[name] for name in PROXY_RESPONSE_HEADERS if name in response.headers}
+        self.content = response.content
+
+    def to_response(self, if_none_match):
+        # Conditional requests are answered here, since coalesced fetches carry no client headers
+        etag = self.headers.get("etag")
+        if self.status_code == 200 and etag is not None and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": self.headers.get("cache-control", "no-cache")})
+        return Response(content=self.content, status_code=self.status_code, headers=self.headers)
+
+
+class BackendProxy:
+    """Forwards todo API calls to BACKEND_URL over the shared client
+
+    Concurrent GETs for the same URL share one upstream request, and 200
+    responses are reused for ttl seconds. A write through the proxy starts
+    a new generation, so later reads never join or reuse an older response.
     """
-    return HTMLResponse(content=html_content)
 
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self._inflight = {}  # (generation, url) -> Task
+        self._cache = collections.OrderedDict()  # (generation, url) -> (expires_at, ProxiedResponse)
+
+    async def _fetch(self, method, url, **kwargs):
+        return ProxiedResponse(await http_client.request(method, f"{BACKEND_URL}{url}", **kwargs))
+
+    async def get(self, url):
+        key = (self.generation, url)
+        entry = self._cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch("GET", url))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # Shielded so one client going away does not cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        response = task.result()
+        if self.ttl > 0 and response.status_code == 200 and key[0] == self.generation:
+            self._cache[key] = (time.monotonic() + self.ttl, response)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    async def write(self, method, url, body, content_type):
+        try:
+            headers = {"content-type": content_type} if content_type else {}
+            return await self._fetch(method, url, content=body, headers=headers)
+        finally:
+            self.generation += 1
+            self._cache.clear()
+
+
+async def stream_from_backend(url):
+    """Relay a streaming backend response (SSE, NDJSON) chunk by chunk"""
+    global active_streams
+    if active_streams >= PROXY_MAX_STREAMS:
+        raise HTTPException(status_code=503, detail="Too many open streams", headers={"Retry-After": "5"})
+    active_streams += 1
+    try:
+        response = await stream_client.send(stream_client.build_request("GET", f"{BACKEND_URL}{url}"), stream=True)
+    except BaseException:
+        active_streams -= 1
+        raise
+
+    async def relay():
+        # Released here rather than in a background task, which Starlette
+        # skips when the stream raises
+        global active_streams
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        except httpx.HTTPError as e:
+            # Headers are already sent; end the stream and let the client reconnect
+            print(f"Backend stream ended early: {e!r}")
+        finally:
+            active_streams -= 1
+            await response.aclose()
+
+    headers = {name: response.headers[name] for name in PROXY_STREAM_HEADERS if name in response.headers}
+    return StreamingResponse(relay(), status_code=response.status_code, headers=headers)
+
+
+@app.api_route("/todos", methods=["GET", "POST"])
+@app.api_route("/todos/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+async def proxy_todos(request: Request, path: str = ""):
+    """Reverse-proxy the todo API to BACKEND_URL"""
+    url = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+    try:
+        if request.method != "GET":
+            proxied = await backend_proxy.write(
+                request.method, url, await request.body(), request.headers.get("content-type")
+            )
+        elif path == "events" or "stream" in request.query_params:
+            return await stream_from_backend(url)
+        else:
+            proxied = await backend_proxy.get(url)
+    except httpx.HTTPError as e:
+        print(f"Backend request failed: {e}")
+        raise HTTPException(status_code=502, detail="Backend unavailable")
+    return proxied.to_response(request.headers.get("if-none-match"))
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 3000))
@@ -0,0 +1,217 @@
+const input = document.getElementById('todoInput');
+const charCount = document.getElementById('charCount');
+const pendingList = document.getElementById('pendingList');
+const doneList = document.getElementById('doneList');
+
+// Rows are keyed by todo id, so a change touches only its own <li>
+const rows = new Map();
+// Sequence number of the last local change per id, so a full sync that
+// started before the change cannot undo it
+let changeSequence = 0;
+const changedAt = new Map();
+let syncsInFlight = 0;
+const emptyText = {
+    pendingList: 'No pending tasks. Add one!',
+    doneList: 'No completed tasks yet.'
+};
+
+input.addEventListener('input', function() {
+    charCount.textContent = this.value.length;
+});
+
+function listFor(todo) {
+    return todo.done ? doneList : pendingList;
+}
+
+function emptyMessage(list) {
+    return list.querySelector('.empty-message');
+}
+
+function updateEmptyMessage(list) {
+    const message = emptyMessage(list);
+    message.textContent = emptyText[list.id];
+    message.hidden = list.querySelector('li[data-id]') !== null;
+}
+
+function createRow(todo) {
+    const li = document.createElement('li');
+    li.dataset.id = todo.id;
+    const text = document.createElement('span');
+    text.className = 'todo-text';
+    const button = document.createElement('button');
+    li.append(text, button);
+    return li;
+}
+
+// Lists are ordered by id like the backend, so find the insert point by binary search
+function insertSorted(list, li, id) {
+    const items = list.children;
+    let low = 0;
+    let high = items.length;
+    while (low < high) {
+        const mid = (low + high) >> 1;
+        const itemId = Number(items[mid].dataset.id);
+        if (Number.isNaN(itemId) || itemId > id) {
+            high = mid;
+        } else {
+            low = mid + 1;
+        }
+    }
+    list.insertBefore(li, items[low] || null);
+}
+
+function applyTodo(todo) {
+    let li = rows.get(todo.id);
+    if (!li) {
+        li = createRow(todo);
+        rows.set(todo.id, li);
+    }
+    const target = listFor(todo);
+    const previous = li.parentElement;
+    const text = li.querySelector('.todo-text');
+    if (text.textContent !== todo.todo) {
+        text.textContent = todo.todo;
+    }
+    if (previous !== target) {
+        const button = li.querySelector('button');
+        li.className = todo.done ? 'done-item' : '';
+        button.className = `toggle-btn ${todo.done ? 'mark-undone' : 'mark-done'}`;
+        button.textContent = todo.done ? 'Undo' : 'Done';
+        button.dataset.done = String(!todo.done);
+        insertSorted(target, li, todo.id);
+        if (previous) {
+            updateEmptyMessage(previous);
+        }
+        updateEmptyMessage(target);
+    }
+}
+
+function noteChange(id) {
+    changedAt.set(id, ++changeSequence);
+}
+
+function changedSince(id, sequence) {
+    return (changedAt.get(id) || 0) > sequence;
+}
+
+function removeTodo(id) {
+    const li = rows.get(id);
+    if (li) {
+        rows.delete(id);
+        const list = li.parentElement;
+        li.remove();
+        updateEmptyMessage(list);
+    }
+}
+
+// Apply one event from the backend's /todos/events feed
+function applyEvent(event) {
+    const todos = event.todos || [event.todo];
+    for (const todo of todos) {
+        noteChange(todo.id);
+        if (event.action === 'deleted' || event.action === 'archived') {
+            removeTodo(todo.id);
+        } else {
+            applyTodo(todo);
+        }
+    }
+}
+
+// Full sync, only on load and when the event feed may have missed changes.
+// The response carries an ETag, so an unchanged list costs a 304.
+async function fetchTodos() {
+    const started = changeSequence;
+    syncsInFlight++;
+    try {
+        const response = await fetch('/todos');
+        const todos = await response.json();
+        const seen = new Set();
+        for (const todo of todos) {
+            seen.add(todo.id);
+            if (!changedSince(todo.id, started)) {
+                applyTodo(todo);
+            }
+        }
+        for (const id of [...rows.keys()]) {
+            if (!seen.has(id) && !changedSince(id, started)) {
+                removeTodo(id);
+            }
+        }
+        updateEmptyMessage(pendingList);
+        updateEmptyMessage(doneList);
+    } catch (error) {
+        console.error('Error fetching todos:', error);
+        for (const list of [pendingList, doneList]) {
+            const message = emptyMessage(list);
+            message.textContent = 'Error loading todos';
+            message.hidden = false;
+        }
+    } finally {
+        if (--syncsInFlight === 0) {
+            changedAt.clear();
+        }
+    }
+}
+
+async function toggleDone(id, done) {
+    try {
+        const response = await fetch(`/todos/${id}`, {
+            method: 'PUT',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ done: done })
+        });
+        if (response.ok) {
+            const todo = await response.json();
+            noteChange(todo.id);
+            applyTodo(todo);
+        }
+    } catch (error) {
+        console.error('Error updating todo:', error);
+    }
+}
+
+async function addTodo() {
+    const value = input.value.trim();
+    if (value && value.length <= 140) {
+        try {
+            const response = await fetch('/todos', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ todo: value })
+            });
+            if (response.ok) {
+                input.value = '';
+                charCount.textContent = '0';
+                const todo = await response.json();
+                noteChange(todo.id);
+                applyTodo(todo);
+            }
+        } catch (error) {
+            console.error('Error creating todo:', error);
+        }
+    }
+}
+
+// One click handler for every row's button
+for (const list of [pendingList, doneList]) {
+    list.addEventListener('click', function(e) {
+        const button = e.target.closest('button');
+        if (button) {
+            toggleDone(Number(button.parentElement.dataset.id), button.dataset.done === 'true');
+        }
+    });
+}
+
+// Other tabs and replicas push their changes through the event feed; on
+// connect (which also covers page load), reconnect or a resync request,
+// catch up with one conditional refetch
+if ('EventSource' in window) {
+    const events = new EventSource('/todos/events');
+    events.onmessage = function(e) {
+        applyEvent(JSON.parse(e.data));
+    };
+    events.addEventListener('resync', fetchTodos);
+    events.onopen = fetchTodos;
+} else {
+    fetchTodos();
+}
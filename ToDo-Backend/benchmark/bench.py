@@ -0,0 +1,406 @@
+import os
+import sys
+import math
+import json
+import time
+import random
+import signal
+import asyncio
+import argparse
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Workload defaults, all overridable from the command line
+DEFAULT_MIX = "list_page=40,list_full=10,get_item=20,create=15,update=15"
+
+
+class NatsStub:
+    """Minimal NATS server speaking just enough protocol for nats-py
+
+    It answers CONNECT/PING and routes each PUB/HPUB to the matching
+    subscriptions as MSG/HMSG (one member per queue group), so the backend's
+    publisher and cache invalidation across workers run their real code
+    paths without a broker.
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.published = 0
+        self._server = None
+        self._subscriptions = {}  # (writer, sid) -> (subject, queue)
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", self.port)
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    @staticmethod
+    def _matches(pattern, subject):
+        pattern, subject = pattern.split("."), subject.split(".")
+        for i, token in enumerate(pattern):
+            if token == ">":
+                return len(subject) > i
+            if i >= len(subject) or (token != "*" and token != subject[i]):
+                return False
+        return len(pattern) == len(subject)
+
+    def _route(self, subject, reply, headers_size, payload):
+        groups = {}
+        for (writer, sid), (pattern, queue) in list(self._subscriptions.items()):
+            if writer.is_closing() or not self._matches(pattern, subject):
+                continue
+            if queue is None:
+                self._deliver(writer, sid, subject, reply, headers_size, payload)
+            else:
+                groups.setdefault(queue, []).append((writer, sid))
+        for members in groups.values():
+            self._deliver(*random.choice(members), subject, reply, headers_size, payload)
+
+    @staticmethod
+    def _deliver(writer, sid, subject, reply, headers_size, payload):
+        reply = f" {reply}" if reply else ""
+        if headers_size is None:
+            head = f"MSG {subject} {sid}{reply} {len(payload) - 2}\r\n"
+        else:
+            head = f"HMSG {subject} {sid}{reply} {headers_size} {len(payload) - 2}\r\n"
+        writer.write(head.encode() + payload)
+
+    async def _handle(self, reader, writer):
+        info = {"server_id": "bench-stub", "version": "2.10.0", "proto": 1, "max_payload": 1048576, "headers": True}
+        writer.write(f"INFO {json.dumps(info)}\r\n".encode())
+        await writer.drain()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.split()
+                op = parts[0].upper() if parts else b""
+                if op == b"PING":
+                    writer.write(b"PONG\r\n")
+                    await writer.drain()
+                elif op == b"SUB":
+                    # SUB <subject> [queue] <sid>
+                    queue = parts[2].decode() if len(parts) == 4 else None
+                    self._subscriptions[(writer, parts[-1].decode())] = (parts[1].decode(), queue)
+                elif op == b"UNSUB":
+                    self._subscriptions.pop((writer, parts[1].decode()), None)
+                elif op in (b"PUB", b"HPUB"):
+                    # PUB <subject> [reply] <size>, HPUB <subject> [reply] <header size> <size>
+                    fields = [part.decode() for part in parts[1:]]
+                    headers_size = int(fields.pop(-2)) if op == b"HPUB" else None
+                    size = int(fields.pop())
+                    payload = await reader.readexactly(size + 2)
+                    self.published += 1
+                    self._route(fields[0], fields[1] if len(fields) > 1 else None, headers_size, payload)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for key in [key for key in self._subscriptions if key[0] is writer]:
+                del self._subscriptions[key]
+            writer.close()
+
+
+def parse_mix(spec):
+    """Parse 'name=weight,...' into a weighted operation table"""
+    mix = {}
+    for part in spec.split(","):
+        name, weight = part.split("=")
+        if name not in OPERATIONS:
+            raise SystemExit(f"Unknown operation '{name}', choose from {', '.join(OPERATIONS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+async def op_list_page(client, state):
+    return await client.get("/todos", params={"limit": 50})
+
+
+async def op_list_full(client, state):
+    return await client.get("/todos")
+
+
+async def op_get_item(client, state):
+    return await client.get(f"/todos/{random.choice(state['ids'])}")
+
+
+async def op_create(client, state):
+    response = await client.post("/todos", json={"todo": f"bench {random.getrandbits(32):08x}"})
+    if response.status_code == 200:
+        state["ids"].append(response.json()["id"])
+    return response
+
+
+async def op_update(client, state):
+    return await client.put(f"/todos/{random.choice(state['ids'])}", json={"done": random.random() < 0.5})
+
+
+OPERATIONS = {
+    "list_page": op_list_page,
+    "list_full": op_list_full,
+    "get_item": op_get_item,
+    "create": op_create,
+    "update": op_update,
+}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    # Rounded first so float noise such as 0.07 * 100 = 7.000000000000001 does not bump the rank
+    rank = math.ceil(round(fraction * len(sorted_values), 9))
+    index = min(len(sorted_values) - 1, max(0, rank - 1))
+    return sorted_values[index]
+
+
+def summarize(samples, elapsed):
+    """Per-operation throughput, error count and latency percentiles in milliseconds"""
+    report = {}
+    for name, entries in sorted(samples.items()):
+        latencies = sorted(latency for latency, ok in entries)
+        errors = sum(1 for _, ok in entries if not ok)
+        report[name] = {
+            "requests": len(entries),
+            "errors": errors,
+            "throughput_rps": round(len(entries) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "max_ms": round(latencies[-1] * 1000, 3),
+        }
+    return report
+
+
+async def seed(client, count, batch_size=500):
+    """Create count todos through the bulk endpoint and return their ids"""
+    ids = []
+    for start in range(0, count, batch_size):
+        chunk = [{"todo": f"seed {i}"} for i in range(start, min(count, start + batch_size))]
+        response = await client.post("/todos/bulk", json=chunk)
+        response.raise_for_status()
+        ids.extend(todo["id"] for todo in response.json())
+    return ids
+
+
+async def run_workload(base_url, mix, concurrency, duration, warmup, seed_count):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        state = {"ids": await seed(client, seed_count)}
+        if not state["ids"]:
+            state["ids"] = await seed(client, 1)
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        samples = {name: [] for name in names}
+        recording = False
+        stop_at = time.perf_counter() + warmup + duration
+
+        async def worker():
+            while time.perf_counter() < stop_at:
+                name = random.choices(names, weights)[0]
+                started = time.perf_counter()
+                try:
+                    response = await OPERATIONS[name](client, state)
+                    ok = response.status_code < 500
+                except httpx.HTTPError:
+                    ok = False
+                if recording:
+                    samples[name].append((time.perf_counter() - started, ok))
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        await asyncio.sleep(warmup)
+        recording = True
+        measured_from = time.perf_counter()
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - measured_from
+    return summarize({k: v for k, v in samples.items() if v}, elapsed), elapsed
+
+
+def start_backend(port, nats_url, extra_env, workers=1):
+    """Migrate the configured database, launch main.py and wait until it is ready"""
+    env = dict(os.environ)
+    env.update({
+        "PORT": str(port),
+        "NATS_URL": nats_url,
+        "LOG_SAMPLE_RATE": env.get("LOG_SAMPLE_RATE", "0"),
+        "WEB_CONCURRENCY": str(workers),
+    })
+    env.update(extra_env)
+    subprocess.run([sys.executable, "migrate.py"], cwd=BACKEND_DIR, env=env, check=True, stdout=subprocess.DEVNULL)
+    process = subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Backend exited early with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/healthz", timeout=1.0).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit("Backend did not become ready within 60s")
+
+
+def stop_backend(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def compare(report, baseline, max_regression):
+    """Return a list of regressions of p95 latency or throughput beyond max_regression"""
+    failures = []
+    for name, current in report["operations"].items():
+        previous = baseline["operations"].get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            failures.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - max_regression):
+            failures.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return failures
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def measure(args, mix, nats_url, workers):
+    """Run the workload once, starting a backend with the given worker count unless --url is set"""
+    process = None
+    base_url = args.url
+    if base_url is None:
+        extra_env = dict(item.split("=", 1) for item in args.env)
+        process = await asyncio.to_thread(start_backend, args.port, nats_url, extra_env, workers)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        return await run_workload(base_url, mix, args.concurrency, args.duration, args.warmup, args.seed)
+    finally:
+        if process is not None:
+            await asyncio.to_thread(stop_backend, process)
+
+
+async def sweep(args, mix, nats_url):
+    """Measure total throughput per worker count and its scaling efficiency against one worker"""
+    counts = [int(count) for count in args.workers_sweep.split(",")]
+    results = []
+    for workers in counts:
+        operations, elapsed = await measure(args, mix, nats_url, workers)
+        throughput = sum(op["requests"] for op in operations.values()) / elapsed
+        results.append({"workers": workers, "total_throughput_rps": round(throughput, 2)})
+    base = results[0]["total_throughput_rps"] / counts[0]
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'efficiency':>10}")
+    for result in results:
+        speedup = result["total_throughput_rps"] / base
+        result["speedup"] = round(speedup, 2)
+        result["efficiency"] = round(speedup / result["workers"], 2)
+        print(f"{result['workers']:>7} {result['total_throughput_rps']:>9} {result['speedup']:>8} {result['efficiency']:>10}")
+    print(f"(host has {os.cpu_count()} CPUs; efficiency drops once workers exceed free cores)")
+    return results
+
+
+async def main(args):
+    mix = parse_mix(args.mix)
+    stub = None
+    nats_url = args.nats_url
+    if nats_url is None:
+        stub = NatsStub(args.nats_stub_port)
+        await stub.start()
+        nats_url = f"nats://127.0.0.1:{args.nats_stub_port}"
+
+    try:
+        if args.workers_sweep:
+            results = await sweep(args, mix, nats_url)
+            if args.output:
+                Path(args.output).write_text(json.dumps({
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                    "git_revision": git_revision(),
+                    "cpu_count": os.cpu_count(),
+                    "sweep": results,
+                }, indent=2))
+                print(f"Results written to {args.output}")
+            return 0
+        operations, elapsed = await measure(args, mix, nats_url, args.workers)
+    finally:
+        if stub is not None:
+            await stub.stop()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "config": {
+            "concurrency": args.concurrency,
+            "workers": args.workers,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "seed": args.seed,
+            "mix": mix,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "total_throughput_rps": round(sum(op["requests"] for op in operations.values()) / elapsed, 2),
+        "operations": operations,
+    }
+
+    print(f"{'operation':<12} {'reqs':>8} {'err':>5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, op in operations.items():
+        print(f"{name:<12} {op['requests']:>8} {op['errors']:>5} {op['throughput_rps']:>9} "
+              f"{op['p50_ms']:>9} {op['p95_ms']:>9} {op['p99_ms']:>9}")
+    print(f"total throughput: {report['total_throughput_rps']} req/s")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        failures = compare(report, baseline, args.max_regression)
+        if failures:
+            print("Regressions against baseline:")
+            for failure in failures:
+                print(f"  {failure}")
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test ToDo-Backend against a local Postgres")
+    parser.add_argument("--url", help="benchmark an already running backend instead of starting one")
+    parser.add_argument("--port", type=int, default=int(os.getenv("BENCH_PORT", "3100")))
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra backend environment")
+    parser.add_argument("--nats-url", help="use a real NATS server instead of the built-in stub")
+    parser.add_argument("--nats-stub-port", type=int, default=4223)
+    parser.add_argument("--workers", type=int, default=1, help="backend worker processes (WEB_CONCURRENCY)")
+    parser.add_argument("--workers-sweep", metavar="N,N,...", help="measure throughput for each worker count, e.g. 1,2,4")
+    parser.add_argument("--seed", type=int, default=1000, help="todos to create before measuring")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before recording")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted operations, e.g. list_page=50,create=50")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against; exit 1 on regression")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed fractional regression")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -3,63 +3,611 @@ import sys
 import time
 import logging
 import json
+import hashlib
 import asyncio
+import collections
+import contextvars
+import queue
+import random
+import atexit
+import logging.handlers
+import tempfile
+import orjson
 import psycopg2
+import psycopg2.extras
 import uvicorn
 import nats
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, HTTPException, Request
+from typing import List, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from migrate import LATEST_SCHEMA_VERSION, current_version
+from migrate import main as run_migrations
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.StreamHandler(sys.stdout)]
-)
+# Logging configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json or text
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))  # fraction of requests whose info logs are kept
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Whether the request being handled was picked for info-level logging
+log_sampled = contextvars.ContextVar("log_sampled", default=True)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including extra= fields"""
+
+    RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in self.RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SampledRequestFilter(logging.Filter):
+    """Keep warnings and errors always, info logs only for sampled requests"""
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or log_sampled.get()
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Queue records for the writer thread, dropping them rather than blocking when full"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+def configure_logging():
+    """Send log records through a bounded queue to a stdout writer thread"""
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    queue_handler.addFilter(SampledRequestFilter())
+    listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+log_listener = configure_logging()
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="ToDo Backend")
+# Serving configuration
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))  # worker processes
+GRACEFUL_SHUTDOWN_TIMEOUT = int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "20"))  # seconds, bounds open SSE streams
+METRICS_SAMPLE_INTERVAL = float(os.getenv("METRICS_SAMPLE_INTERVAL", "5"))  # seconds between gauge updates
+
+# Prometheus metrics; with several workers, PROMETHEUS_MULTIPROC_DIR makes
+# every process write its samples to files that /metrics aggregates
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template and status code",
+    ["method", "route", "status"],
+)
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "Time spent running a pooled database transaction",
+    ["operation"],
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a pooled database connection",
+)
+DB_POOL_IN_USE = Gauge("db_pool_connections_in_use", "Pooled database connections currently checked out", multiprocess_mode="livesum")
+DB_POOL_IDLE = Gauge("db_pool_connections_idle", "Pooled database connections currently idle", multiprocess_mode="livesum")
+NATS_PUBLISH_LATENCY = Histogram(
+    "nats_publish_batch_duration_seconds",
+    "Time to publish and flush one batch of events to NATS",
+)
+NATS_PUBLISHED = Counter("nats_published_events_total", "Events confirmed by NATS")
+NATS_PUBLISH_FAILURES = Counter("nats_publish_failures_total", "Events whose publish to NATS failed")
+NATS_DROPPED = Counter("nats_dropped_events_total", "Events evicted from a full publish queue")
+NATS_QUEUE_DEPTH = Gauge("nats_publish_queue_depth", "Events waiting in the publish queue", multiprocess_mode="livesum")
+SSE_CLIENTS = Gauge("sse_clients", "Connected Server-Sent Events clients", multiprocess_mode="livesum")
+LOGS_DROPPED = Gauge("log_records_dropped", "Log records dropped because the log queue was full", multiprocess_mode="livesum")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Set up this worker process's state on startup and tear it down on shutdown
+
+    Everything per-process (pool, NATS connection, cache, SSE hub, background
+    tasks) is created here, so each worker started by WEB_CONCURRENCY gets
+    its own copy.
+    """
+    global db_pool, nats_publisher, outbox_wakeup, todo_cache, todo_event_hub, readiness
+    todo_cache = TodoListCache(TODO_CACHE_TTL, TODO_CACHE_MAX_ENTRIES)
+    todo_event_hub = TodoEventHub(SSE_MAX_CLIENTS, SSE_CLIENT_QUEUE_SIZE)
+    db_pool = DatabasePool(
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT,
+        max_idle=DB_POOL_MAX_IDLE,
+        max_lifetime=DB_POOL_MAX_LIFETIME,
+        max_streams=TODOS_MAX_STREAMS,
+    )
+    await db_pool.open()
+    readiness = ReadinessProbe(
+        interval=READINESS_CHECK_INTERVAL,
+        timeout=READINESS_CHECK_TIMEOUT,
+        ttl=READINESS_TTL,
+        max_saturation=READINESS_MAX_POOL_SATURATION,
+    )
+    nats_publisher = NatsPublisher(
+        url=NATS_URL,
+        subject=NATS_SUBJECT,
+        max_queue=NATS_QUEUE_SIZE,
+        batch_size=NATS_BATCH_SIZE,
+        flush_interval=NATS_FLUSH_INTERVAL,
+        overflow=NATS_OVERFLOW,
+    )
+    outbox_wakeup = asyncio.Event()
+    publisher = asyncio.create_task(nats_publisher.run())
+    listener = asyncio.create_task(listen_for_todo_events())
+    relay = asyncio.create_task(relay_outbox())
+    sampler = asyncio.create_task(sample_gauges())
+    checker = asyncio.create_task(readiness.run())
+    tasks = (checker, sampler, relay, listener, publisher)
+    if ARCHIVE_INTERVAL > 0:
+        tasks += (asyncio.create_task(archive_done_todos()),)
+    try:
+        yield
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await nats_publisher.close()
+        await db_pool.close()
+        db_pool = None
+
+
+# orjson encodes responses several times faster than the stdlib json module
+app = FastAPI(title="ToDo Backend", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # NATS configuration
 NATS_URL = os.getenv("NATS_URL", "nats://my-nats:4222")
 NATS_SUBJECT = "todos"
-nats_client = None
+NATS_CONNECT_TIMEOUT = float(os.getenv("NATS_CONNECT_TIMEOUT", "2"))  # seconds per connect attempt
+NATS_QUEUE_SIZE = int(os.getenv("NATS_QUEUE_SIZE", "10000"))
+NATS_BATCH_SIZE = int(os.getenv("NATS_BATCH_SIZE", "100"))
+NATS_FLUSH_INTERVAL = float(os.getenv("NATS_FLUSH_INTERVAL", "0.05"))  # seconds to wait for a batch to fill
+NATS_OVERFLOW = os.getenv("NATS_OVERFLOW", "drop_oldest")  # drop_oldest or block
+nats_publisher = None
+
+# Outbox relay configuration
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))  # seconds
+OUTBOX_CLAIM_TIMEOUT = int(os.getenv("OUTBOX_CLAIM_TIMEOUT", "30"))  # seconds before an unsent claim is retried
+outbox_wakeup = None
+
+# Archival configuration; done todos move to todos_archive to keep the hot table small
+ARCHIVE_AFTER = int(os.getenv("ARCHIVE_AFTER", str(7 * 24 * 3600)))  # seconds a todo stays done before archival
+ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", "3600"))  # seconds between archival runs, 0 disables
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+
+# Server-Sent Events configuration
+SSE_MAX_CLIENTS = int(os.getenv("SSE_MAX_CLIENTS", "10000"))
+SSE_CLIENT_QUEUE_SIZE = int(os.getenv("SSE_CLIENT_QUEUE_SIZE", "100"))
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))  # seconds
+
+# Todo list cache configuration
+TODO_CACHE_TTL = float(os.getenv("TODO_CACHE_TTL", "30"))  # seconds, safety net for missed events
+TODO_CACHE_MAX_ENTRIES = int(os.getenv("TODO_CACHE_MAX_ENTRIES", "256"))
+
+
+class PublishDropped(Exception):
+    """Raised on a queued publish that was evicted by drop-oldest backpressure"""
+
+
+class NatsPublisher:
+    """Owns the NATS connection and publishes queued payloads in batches
+
+    Callers only enqueue. A background task connects with backoff, collects
+    up to batch_size payloads or waits flush_interval seconds, publishes
+    them and flushes once per batch. When the queue is full, overflow
+    decides whether publish() waits for room or evicts the oldest payload.
+    """
+
+    def __init__(self, url, subject, max_queue, batch_size, flush_interval, overflow):
+        self.url = url
+        self.subject = subject
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.client = None
+        self.published = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._connected = asyncio.Event()
+        self._last_error = None
+
+    @property
+    def connected(self):
+        return self.client is not None and self.client.is_connected
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "queue_depth": self.queue_depth,
+            "published": self.published,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+    async def publish(self, payload: bytes):
+        """Queue a payload and return a future that resolves once NATS has it"""
+        future = asyncio.get_running_loop().create_future()
+        if self._queue.full() and self.overflow == "drop_oldest":
+            _, oldest = self._queue.get_nowait()
+            self.dropped += 1
+            NATS_DROPPED.inc()
+            if not oldest.done():
+                oldest.set_exception(PublishDropped("Publish queue full"))
+        await self._queue.put((payload, future))
+        return future
+
+    async def wait_connected(self):
+        await self._connected.wait()
+        return self.client
+
+    async def _on_error(self, e):
+        # nats-py reports every failed reconnect attempt here; log each distinct
+        # error once instead of its default traceback per attempt
+        error = repr(e)
+        if error != self._last_error:
+            logger.warning(f"NATS error: {error}")
+            self._last_error = error
+
+    async def _on_disconnected(self):
+        self._connected.clear()
+        # Events published while we are away are lost, so start cold on return
+        todo_cache.invalidate()
+
+    async def _on_reconnected(self):
+        self._connected.set()
+        self._last_error = None
+        logger.info(f"Reconnected to NATS at {self.url}")
+        todo_cache.invalidate()
+        todo_event_hub.resync()
+        wake_outbox_relay()
+
+    async def _connect(self):
+        """Connect with capped exponential backoff; nats-py handles later reconnects"""
+        delay = 1
+        while True:
+            client = nats.NATS()
+            try:
+                await asyncio.wait_for(
+                    client.connect(
+                        servers=[self.url],
+                        max_reconnect_attempts=-1,
+                        error_cb=self._on_error,
+                        disconnected_cb=self._on_disconnected,
+                        reconnected_cb=self._on_reconnected,
+                    ),
+                    timeout=NATS_CONNECT_TIMEOUT,
+                )
+                self.client = client
+                self._connected.set()
+                self._last_error = None
+                logger.info(f"Connected to NATS at {self.url}")
+                # Flush anything that piled up in the outbox while we were away
+                wake_outbox_relay()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Failed to connect to NATS: {e!r}, retrying in {delay}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        await self._connect()
+        while True:
+            batch = await self._next_batch()
+            await self._connected.wait()
+            started = time.perf_counter()
+            try:
+                for payload, _ in batch:
+                    await self.client.publish(self.subject, payload)
+                await self.client.flush(timeout=NATS_CONNECT_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += len(batch)
+                NATS_PUBLISH_FAILURES.inc(len(batch))
+                logger.error(f"Failed to publish {len(batch)} events to NATS: {e!r}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            NATS_PUBLISH_LATENCY.observe(time.perf_counter() - started)
+            self.published += len(batch)
+            NATS_PUBLISHED.inc(len(batch))
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def close(self):
+        if self.client is not None and not self.client.is_closed:
+            await self.client.close()
+
+
+class TodoListCache:
+    """In-process cache of serialized GET /todos responses
+
+    Entries are only served while this replica is subscribed to the todos
+    subject, so writes made through any replica invalidate every copy. A
+    generation counter stops a read that raced with a write from storing a
+    stale body.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.generation = 0
+        self.revision = None  # last known todo_revision, cleared with the entries
+        self._entries = {}  # key -> (stored_at, body, headers)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored_at, body, headers = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            return None
+        return body, headers
+
+    def set(self, key, body, headers, generation):
+        if generation != self.generation:
+            return
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+        self._entries[key] = (time.monotonic(), body, headers)
+
+    def remember_revision(self, revision, generation):
+        if generation == self.generation:
+            self.revision = revision
+
+    def invalidate(self):
+        self.generation += 1
+        self.revision = None
+        self._entries.clear()
+
+
+todo_cache = None
+
+
+class TodoEventHub:
+    """Fans todo events from this replica's NATS subscription out to SSE clients
+
+    Every client gets a small bounded queue of pre-encoded frames. A client
+    that falls behind is disconnected rather than buffered without limit;
+    it reconnects and refetches like any other client that missed events.
+    """
+
+    RESYNC = b"event: resync\ndata: {}\n\n"
+
+    def __init__(self, max_clients, queue_size):
+        self.max_clients = max_clients
+        self.queue_size = queue_size
+        self._clients = set()
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    def subscribe(self):
+        if len(self._clients) >= self.max_clients:
+            return None
+        client = asyncio.Queue(maxsize=self.queue_size)
+        self._clients.add(client)
+        return client
+
+    def unsubscribe(self, client):
+        self._clients.discard(client)
+
+    def _broadcast(self, frame):
+        for client in list(self._clients):
+            try:
+                client.put_nowait(frame)
+            except asyncio.QueueFull:
+                # None tells the client's stream to end
+                self._clients.discard(client)
+                client.get_nowait()
+                client.put_nowait(None)
 
+    def publish(self, payload: bytes):
+        # Encode once and share the frame between every client
+        self._broadcast(b"data: " + payload + b"\n\n")
 
-async def get_nats_client():
-    """Get or create NATS client connection"""
-    global nats_client
-    if nats_client is None or not nats_client.is_connected:
+    def resync(self):
+        """Tell clients that events may have been missed and they should refetch"""
+        self._broadcast(self.RESYNC)
+
+
+todo_event_hub = None
+todo_events_subscribed = False
+
+
+def todo_cache_usable():
+    """The cache is only coherent while we are hearing other replicas' events"""
+    return todo_events_subscribed and nats_publisher is not None and nats_publisher.connected
+
+
+async def on_todo_event(msg):
+    """Drop cached todo lists and notify SSE clients whenever any replica changes a todo"""
+    todo_cache.invalidate()
+    todo_event_hub.publish(msg.data)
+
+
+async def listen_for_todo_events():
+    """Keep a subscription to the todos subject alive for cache invalidation"""
+    global todo_events_subscribed
+    while True:
+        nc = await nats_publisher.wait_connected()
         try:
-            nats_client = await nats.connect(servers=[NATS_URL])
-            logger.info(f"Connected to NATS at {NATS_URL}")
+            await nc.subscribe(NATS_SUBJECT, cb=on_todo_event)
+            todo_cache.invalidate()
+            todo_event_hub.resync()
+            todo_events_subscribed = True
+            logger.info(f"Subscribed to {NATS_SUBJECT} for cache invalidation")
+            # nats-py resubscribes by itself after reconnects; only start over once closed
+            while not nc.is_closed:
+                await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.warning(f"Failed to connect to NATS: {e}")
-            return None
-    return nats_client
+            logger.warning(f"Todo event subscription failed: {e}")
+            await asyncio.sleep(5)
+        finally:
+            todo_events_subscribed = False
 
 
-async def publish_todo_event(action: str, todo: dict):
-    """Publish todo event to NATS"""
-    try:
-        nc = await get_nats_client()
-        if nc is None:
-            logger.warning("NATS not available, skipping event publish")
-            return
-        
-        message = {
-            "action": action,
-            "todo": todo,
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        await nc.publish(NATS_SUBJECT, json.dumps(message).encode())
-        logger.info(f"Published {action} event for todo {todo.get('id')} to NATS")
-    except Exception as e:
-        logger.error(f"Failed to publish to NATS: {e}")
+def todo_event(action: str, todo: dict):
+    """Serialize a todo event as published on NATS"""
+    message = {
+        "action": action,
+        "todo": todo,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    return orjson.dumps(message).decode()
+
+
+def todo_batch_event(action: str, todos: list):
+    """Serialize one event covering a batch of todos"""
+    message = {
+        "action": action,
+        "todos": todos,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    return orjson.dumps(message).decode()
+
+
+def wake_outbox_relay():
+    """Nudge the relay so committed events go out without waiting for the next poll"""
+    if outbox_wakeup is not None:
+        outbox_wakeup.set()
+
+
+async def relay_outbox_batch():
+    """Hand one claimed batch of outbox events to the publisher; returns how many were sent"""
+    if not nats_publisher.connected:
+        return 0
+    rows = await db_pool.run(_claim_outbox, OUTBOX_BATCH_SIZE, OUTBOX_CLAIM_TIMEOUT)
+    if not rows:
+        return 0
+    futures = [await nats_publisher.publish(payload.encode()) for _, payload in rows]
+    results = await asyncio.gather(*futures, return_exceptions=True)
+    # Only forget the events the server has; the rest are retried once their lease expires
+    sent = [row[0] for row, result in zip(rows, results) if not isinstance(result, BaseException)]
+    if sent:
+        await db_pool.run(_delete_outbox, sent)
+    if len(sent) < len(rows):
+        logger.warning(f"Relayed {len(sent)} of {len(rows)} outbox events to NATS")
+        return 0
+    logger.info(f"Relayed {len(rows)} outbox events to NATS")
+    return len(rows)
+
+
+async def relay_outbox():
+    """Drain committed todo events from the outbox table to NATS
+
+    Rows are claimed with a lease rather than deleted up front, so a crash or
+    NATS failure mid-batch only delays those events until the lease runs out.
+    Delivery is at-least-once.
+    """
+    while True:
+        try:
+            await asyncio.wait_for(outbox_wakeup.wait(), timeout=OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        outbox_wakeup.clear()
+        try:
+            while await relay_outbox_batch() == OUTBOX_BATCH_SIZE:
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to relay outbox events to NATS: {e}")
+
+
+async def archive_done_todos():
+    """Periodically move todos that have been done for ARCHIVE_AFTER seconds into todos_archive
+
+    Batches are claimed with SKIP LOCKED, so every worker and replica can run
+    this loop without moving a row twice.
+    """
+    while True:
+        try:
+            archived = 0
+            while True:
+                rows = await db_pool.run(_archive_done_todos, ARCHIVE_AFTER, ARCHIVE_BATCH_SIZE)
+                archived += len(rows)
+                if len(rows) < ARCHIVE_BATCH_SIZE:
+                    break
+            if archived:
+                logger.info(f"Archived {archived} done todos")
+                todo_cache.invalidate()
+                wake_outbox_relay()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to archive done todos: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL)
+
 
 # Enable CORS for frontend
 app.add_middleware(
@@ -68,6 +616,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Next-Offset", "ETag"],
 )
 
 # Database configuration
@@ -77,24 +626,91 @@ DB_NAME = os.getenv("DB_NAME", "tododb")
 DB_USER = os.getenv("DB_USER", "todouser")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "todopassword")
 
+# Pending migrations run before the server starts, since the deployment has
+# no separate migration job yet; runners take turns on an advisory lock, so
+# several pods starting at once is safe. Set MIGRATE_ON_START=false once
+# python migrate.py runs as a job or init container ahead of the rollout.
+MIGRATE_ON_START = os.getenv("MIGRATE_ON_START", "true").lower() == "true"
+schema_verified = False
+
+# Pagination configuration
+TODOS_MAX_PAGE_SIZE = int(os.getenv("TODOS_MAX_PAGE_SIZE", "500"))
+TODOS_STREAM_BATCH_SIZE = int(os.getenv("TODOS_STREAM_BATCH_SIZE", "1000"))
+TODOS_MAX_BULK_SIZE = int(os.getenv("TODOS_MAX_BULK_SIZE", "1000"))
+TODOS_MAX_SEARCH_OFFSET = int(os.getenv("TODOS_MAX_SEARCH_OFFSET", "1000"))
+# Search ranks at most this many matching rows (or offset + limit, if larger),
+# so a term matching most of the table still answers in milliseconds; for
+# such terms the best ranked rows are picked from the first matches only
+TODOS_SEARCH_MAX_CANDIDATES = int(os.getenv("TODOS_SEARCH_MAX_CANDIDATES", "2000"))
+
+# Connection pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT", "5"))  # seconds
+DB_POOL_MAX_IDLE = float(os.getenv("DB_POOL_MAX_IDLE", "30"))  # seconds before an idle connection is re-checked
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # seconds before a connection is recycled
+# ?stream= responses hold a connection until the client has read everything;
+# keep this below DB_POOL_MAX_SIZE so other requests always find one
+TODOS_MAX_STREAMS = int(os.getenv("TODOS_MAX_STREAMS", str(max(1, DB_POOL_MAX_SIZE // 2))))
+db_pool = None
+
+# Readiness probe configuration
+READINESS_CHECK_INTERVAL = float(os.getenv("READINESS_CHECK_INTERVAL", "5"))  # seconds between database checks
+READINESS_CHECK_TIMEOUT = float(os.getenv("READINESS_CHECK_TIMEOUT", "3"))  # seconds before a check counts as failed
+READINESS_TTL = float(os.getenv("READINESS_TTL", "15"))  # seconds a successful check stays valid
+READINESS_MAX_POOL_SATURATION = float(os.getenv("READINESS_MAX_POOL_SATURATION", "2"))  # (in use + waiting) / max size
+readiness = None
+
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Log all incoming requests"""
-    start_time = time.time()
-    
-    # Log request
-    logger.info(f"REQUEST: {request.method} {request.url.path}")
+    """Log all incoming requests and record their latency"""
+    start_time = time.perf_counter()
+    # Decide once per request so a sampled request keeps all of its info lines
+    log_sampled.set(LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE)
     
     response = await call_next(request)
     
     # Log response
-    duration = time.time() - start_time
-    logger.info(f"RESPONSE: {request.method} {request.url.path} - Status: {response.status_code} - Duration: {duration:.3f}s")
+    duration = time.perf_counter() - start_time
+    level = logging.WARNING if response.status_code >= 500 else logging.INFO
+    logger.log(
+        level,
+        "RESPONSE: %s %s - Status: %s - Duration: %.3fs",
+        request.method, request.url.path, response.status_code, duration,
+        extra={
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000, 3),
+        },
+    )
+    
+    # Label by route template so path parameters do not explode cardinality
+    route = request.scope.get("route")
+    REQUEST_LATENCY.labels(
+        request.method,
+        route.path if route is not None else "unmatched",
+        str(response.status_code),
+    ).observe(duration)
     
     return response
 
 
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the acquire timeout"""
+
+
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    """Shed load with 503 when the connection pool is exhausted"""
+    logger.warning(f"POOL EXHAUSTED: {request.method} {request.url.path} - {exc}")
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "Database busy, try again later"}
+    )
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle validation errors (like too long todos)"""
@@ -104,13 +720,13 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     for error in error_details:
         if error.get('type') == 'string_too_long':
             logger.warning(f"BLOCKED: Todo exceeds 140 characters - Path: {request.url.path}")
-            return JSONResponse(
+            return ORJSONResponse(
                 status_code=400,
                 content={"detail": "Todo must be 140 characters or less"}
             )
     
     logger.warning(f"VALIDATION ERROR: {error_details}")
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content={"detail": error_details}
     )
@@ -127,34 +743,285 @@ def get_db_connection():
     )
 
 
-def init_db():
-    """Initialize database table"""
-    retries = 10
-    while retries > 0:
+def _is_alive(conn):
+    """Check that a pooled connection still talks to the server"""
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def _close_quietly(conn):
+    """Close a connection, ignoring errors from already broken sockets"""
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _run_transaction(conn, fn, args):
+    """Run fn(cursor, *args) and commit, rolling back on failure"""
+    try:
+        with conn.cursor() as cur:
+            result = fn(cur, *args)
+        conn.commit()
+        return result
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+
+
+class DatabasePool:
+    """Bounded psycopg2 connection pool that keeps blocking calls off the event loop
+
+    Connections are handed out under a semaphore so at most max_size exist at
+    once, and every connect/query runs on a dedicated thread pool of the same
+    size. Idle connections are re-checked with SELECT 1 after max_idle seconds
+    and recycled after max_lifetime seconds. At most max_streams connections
+    are held by stream() at once; further streams are refused immediately.
+    """
+
+    def __init__(self, min_size, max_size, acquire_timeout, max_idle, max_lifetime, max_streams):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self._idle = collections.deque()  # (conn, created_at, last_used_at)
+        self.in_use = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_size)
+        self._stream_semaphore = asyncio.Semaphore(max_streams)
+        self._executor = ThreadPoolExecutor(max_workers=max_size, thread_name_prefix="db")
+
+    async def _in_thread(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def open(self):
+        """Pre-warm min_size connections; failures are retried lazily on first use"""
+        for _ in range(self.min_size):
+            try:
+                conn = await self._in_thread(get_db_connection)
+            except Exception as e:
+                logger.warning(f"Database pool warm-up failed: {e}")
+                break
+            now = time.monotonic()
+            self._idle.append((conn, now, now))
+        logger.info(f"Database pool opened (min={self.min_size}, max={self.max_size}, idle={len(self._idle)})")
+
+    async def close(self):
+        """Close idle connections and stop the worker threads"""
+        while self._idle:
+            conn, _, _ = self._idle.pop()
+            _close_quietly(conn)
+        self._executor.shutdown(wait=False)
+        logger.info("Database pool closed")
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    @property
+    def saturation(self):
+        """Checked-out plus queued acquires relative to max_size; above 1 means callers are waiting"""
+        return (self.in_use + self.waiting) / self.max_size
+
+    async def _acquire(self):
+        started = time.perf_counter()
+        self.waiting += 1
         try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS todos (
-                    id SERIAL PRIMARY KEY,
-                    todo VARCHAR(140) NOT NULL,
-                    done BOOLEAN NOT NULL DEFAULT FALSE
-                )
-            """)
-            # Add done column if it doesn't exist (for existing databases)
-            cur.execute("""
-                ALTER TABLE todos ADD COLUMN IF NOT EXISTS done BOOLEAN NOT NULL DEFAULT FALSE
-            """)
-            conn.commit()
-            cur.close()
-            conn.close()
-            logger.info("Database initialized successfully")
-            return
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise PoolTimeout(f"No database connection available within {self.acquire_timeout}s")
+        finally:
+            self.waiting -= 1
+            DB_POOL_WAIT.observe(time.perf_counter() - started)
+        self.in_use += 1
+        try:
+            while self._idle:
+                # LIFO keeps the most recently used connections warm
+                conn, created_at, last_used_at = self._idle.pop()
+                now = time.monotonic()
+                if conn.closed or now - created_at > self.max_lifetime:
+                    self._executor.submit(_close_quietly, conn)
+                    continue
+                if now - last_used_at > self.max_idle and not await self._in_thread(_is_alive, conn):
+                    self._executor.submit(_close_quietly, conn)
+                    continue
+                return conn, created_at
+            conn = await self._in_thread(get_db_connection)
+            return conn, time.monotonic()
+        except BaseException:
+            self.in_use -= 1
+            self._semaphore.release()
+            raise
+
+    def _release(self, conn, created_at, discard=False):
+        if discard or conn.closed:
+            self._executor.submit(_close_quietly, conn)
+        else:
+            self._idle.append((conn, created_at, time.monotonic()))
+        self.in_use -= 1
+        self._semaphore.release()
+
+    async def run(self, fn, *args):
+        """Run fn(cursor, *args) in one transaction on a pooled connection"""
+        conn, created_at = await self._acquire()
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        future = loop.run_in_executor(self._executor, _run_transaction, conn, fn, args)
+        try:
+            result = await asyncio.shield(future)
+            DB_QUERY_LATENCY.labels(fn.__name__.lstrip("_")).observe(time.perf_counter() - started)
+        except asyncio.CancelledError:
+            # The worker thread still owns the connection; hand it back once it is done
+            future.add_done_callback(
+                lambda f: self._release(conn, created_at, discard=f.exception() is not None)
+            )
+            raise
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self._release(conn, created_at, discard=True)
+            raise
+        except BaseException:
+            self._release(conn, created_at)
+            raise
+        self._release(conn, created_at)
+        return result
+
+    async def stream(self, query, params=None, batch_size=1000):
+        """Yield the rows of query in batches from a server-side cursor
+
+        The connection is held for the lifetime of the generator, so memory
+        stays bounded by batch_size however many rows match.
+        """
+        if self._stream_semaphore.locked():
+            raise PoolTimeout("Too many concurrent streams")
+        await self._stream_semaphore.acquire()
+        try:
+            conn, created_at = await self._acquire()
+        except BaseException:
+            self._stream_semaphore.release()
+            raise
+        cur = None
+        finished = False
+        try:
+            cur = conn.cursor(name="todos_stream")
+            cur.itersize = batch_size
+            await self._in_thread(cur.execute, query, params)
+            while True:
+                rows = await self._in_thread(cur.fetchmany, batch_size)
+                if not rows:
+                    break
+                yield rows
+            await self._in_thread(_finish_stream, conn, cur)
+            finished = True
+        finally:
+            # An abandoned stream (client gone, error) may still have a worker
+            # mid-fetch on this connection, so it is discarded rather than reused
+            self._release(conn, created_at, discard=not finished)
+            self._stream_semaphore.release()
+
+
+def _finish_stream(conn, cur):
+    """Close a server-side cursor and end its read-only transaction"""
+    cur.close()
+    conn.rollback()
+
+
+def _schema_version(cur):
+    return current_version(cur)
+
+
+async def verify_schema():
+    """Check once that migrate.py has brought the schema up to this build's version"""
+    global schema_verified
+    version = await db_pool.run(_schema_version)
+    if version < LATEST_SCHEMA_VERSION:
+        logger.error(f"Database schema is at version {version}, this build needs {LATEST_SCHEMA_VERSION}; run migrate.py")
+        return False
+    schema_verified = True
+    logger.info(f"Database schema verified at version {version}")
+    return True
+
+
+class ReadinessProbe:
+    """Keeps the readiness verdict current so probes are answered from memory
+
+    A background task checks the schema once and then pings the database on
+    a pooled connection every interval. A result older than ttl counts as a
+    failure, so a stuck checker cannot keep the pod ready. Pool saturation
+    is read live on every probe.
+    """
+
+    def __init__(self, interval, timeout, ttl, max_saturation):
+        self.interval = interval
+        self.timeout = timeout
+        self.ttl = ttl
+        self.max_saturation = max_saturation
+        self.ok = False
+        self.error = "Readiness not checked yet"
+        self.checked_at = None
+
+    async def check(self):
+        try:
+            if schema_verified:
+                await asyncio.wait_for(db_pool.run(_ping), self.timeout)
+                error = None
+            elif await asyncio.wait_for(verify_schema(), self.timeout):
+                error = None
+            else:
+                error = "Database schema is out of date"
+        except PoolTimeout:
+            error = "Database pool exhausted"
+        except asyncio.TimeoutError:
+            error = f"Database check timed out after {self.timeout}s"
         except Exception as e:
-            logger.warning(f"Database connection failed, retrying... ({e})")
-            retries -= 1
-            time.sleep(2)
-    logger.error("Failed to initialize database")
+            error = f"Database connection failed: {e}"
+        if error != self.error:
+            if error is None:
+                logger.info("Readiness check passed")
+            else:
+                logger.error(f"Readiness check failed: {error}")
+        self.ok = error is None
+        self.error = error
+        self.checked_at = time.monotonic()
+
+    async def run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+    def status(self):
+        """Return (ready, body) from the last check and the current pool load"""
+        age = None if self.checked_at is None else time.monotonic() - self.checked_at
+        saturation = db_pool.saturation
+        if not self.ok:
+            reason = self.error
+        elif age > self.ttl:
+            reason = f"Last database check is {age:.0f}s old"
+        elif saturation > self.max_saturation:
+            reason = "Database pool saturated"
+        else:
+            reason = None
+        body = {
+            "status": "ready" if reason is None else "not ready",
+            "database": "connected" if self.ok else "unavailable",
+            "checked_seconds_ago": None if age is None else round(age, 3),
+            "pool": {
+                "in_use": db_pool.in_use,
+                "waiting": db_pool.waiting,
+                "max_size": db_pool.max_size,
+                "saturation": round(saturation, 3),
+            },
+        }
+        if reason is not None:
+            body["reason"] = reason
+        return reason is None, body
 
 
 class TodoCreate(BaseModel):
@@ -165,23 +1032,473 @@ class TodoUpdate(BaseModel):
     done: bool
 
 
+class TodoBulkUpdate(TodoUpdate):
+    id: int
+
+
+def encode_cursor(todo):
+    """Encode the (done, id) position of a todo as an opaque page cursor"""
+    return f"{int(todo['done'])}:{todo['id']}"
+
+
+def decode_cursor(cursor):
+    """Decode a page cursor back into a (done, id) tuple"""
+    try:
+        done, todo_id = cursor.split(":")
+        if done not in ("0", "1"):
+            raise ValueError(done)
+        return done == "1", int(todo_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _todos_query(limit=None, after=None, done=None):
+    """Build the ordered todo listing query and its parameters"""
+    conditions = []
+    params = []
+    if done is not None:
+        conditions.append("done = %s")
+        params.append(done)
+    if after is not None:
+        # Row comparison lets Postgres seek straight into todos_done_id_idx
+        conditions.append("(done, id) > (%s, %s)")
+        params.extend(after)
+    query = "SELECT id, todo, done FROM todos"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY done, id"
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+def _current_revision(cur):
+    cur.execute("SELECT revision FROM todo_revision WHERE id = 1")
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def _bump_revision(cur):
+    cur.execute("UPDATE todo_revision SET revision = revision + 1 WHERE id = 1")
+
+
+def _select_todos(cur, limit=None, after=None, done=None):
+    # Read the revision first: if a write lands in between, the ETag is merely
+    # older than the body, which costs a refetch but never serves stale data
+    revision = _current_revision(cur)
+    cur.execute(*_todos_query(limit, after, done))
+    return revision, cur.fetchall()
+
+
+def _select_todo(cur, todo_id):
+    revision = _current_revision(cur)
+    cur.execute("SELECT id, todo, done FROM todos WHERE id = %s", (todo_id,))
+    return revision, cur.fetchone()
+
+
+def row_to_todo(row):
+    return {"id": row[0], "todo": row[1], "done": row[2]}
+
+
+def _enqueue_event(cur, payload):
+    cur.execute("INSERT INTO todo_outbox (payload) VALUES (%s)", (payload,))
+
+
+def _claim_outbox(cur, limit, lease_seconds):
+    cur.execute(
+        """
+        UPDATE todo_outbox SET claimed_until = now() + make_interval(secs => %s)
+        WHERE id IN (
+            SELECT id FROM todo_outbox
+            WHERE claimed_until IS NULL OR claimed_until < now()
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, payload
+        """,
+        (lease_seconds, limit)
+    )
+    return sorted(cur.fetchall())
+
+
+def _delete_outbox(cur, ids):
+    cur.execute("DELETE FROM todo_outbox WHERE id = ANY(%s)", (ids,))
+
+
+def _search_todos(cur, text, limit, offset):
+    # Matches come from todos_search_vector_idx; only the first candidates are ranked
+    cur.execute(
+        """
+        WITH candidates AS (
+            SELECT id, todo, done, search_vector, query
+            FROM todos, websearch_to_tsquery('english', %s) AS query
+            WHERE search_vector @@ query
+            LIMIT %s
+        )
+        SELECT id, todo, done
+        FROM candidates
+        ORDER BY ts_rank(search_vector, query) DESC, id
+        LIMIT %s OFFSET %s
+        """,
+        (text, max(TODOS_SEARCH_MAX_CANDIDATES, limit + offset), limit, offset)
+    )
+    return cur.fetchall()
+
+
+def _insert_todo(cur, text):
+    cur.execute(
+        "INSERT INTO todos (todo, done) VALUES (%s, FALSE) RETURNING id, todo, done",
+        (text,)
+    )
+    row = cur.fetchone()
+    _bump_revision(cur)
+    _enqueue_event(cur, todo_event("created", row_to_todo(row)))
+    return row
+
+
+def _update_todo_done(cur, todo_id, done):
+    # done_at keeps the time of the first completion and is cleared on reopen
+    cur.execute(
+        """
+        UPDATE todos SET done = %s, done_at = CASE WHEN %s THEN COALESCE(done_at, now()) END
+        WHERE id = %s
+        RETURNING id, todo, done
+        """,
+        (done, done, todo_id)
+    )
+    row = cur.fetchone()
+    if row is not None:
+        _bump_revision(cur)
+        _enqueue_event(cur, todo_event("updated", row_to_todo(row)))
+    return row
+
+
+def _insert_todos(cur, texts):
+    rows = psycopg2.extras.execute_values(
+        cur,
+        "INSERT INTO todos (todo, done) VALUES %s RETURNING id, todo, done",
+        [(text,) for text in texts],
+        template="(%s, FALSE)",
+        page_size=len(texts),
+        fetch=True
+    )
+    _bump_revision(cur)
+    _enqueue_event(cur, todo_batch_event("created", [row_to_todo(row) for row in rows]))
+    return rows
+
+
+def _update_todos_done(cur, changes):
+    rows = psycopg2.extras.execute_values(
+        cur,
+        """
+        UPDATE todos SET done = v.done, done_at = CASE WHEN v.done THEN COALESCE(todos.done_at, now()) END
+        FROM (VALUES %s) AS v (id, done)
+        WHERE todos.id = v.id
+        RETURNING todos.id, todos.todo, todos.done
+        """,
+        changes,
+        template="(%s::integer, %s::boolean)",
+        page_size=len(changes),
+        fetch=True
+    )
+    if rows:
+        _bump_revision(cur)
+        _enqueue_event(cur, todo_batch_event("updated", [row_to_todo(row) for row in rows]))
+    return rows
+
+
+def _delete_todo(cur, todo_id):
+    # Soft delete: the row moves to todos_archive instead of disappearing
+    cur.execute(
+        """
+        WITH moved AS (
+            DELETE FROM todos WHERE id = %s RETURNING id, todo, done, done_at
+        )
+        INSERT INTO todos_archive (id, todo, done, done_at, reason)
+        SELECT id, todo, done, done_at, 'deleted' FROM moved
+        RETURNING id, todo, done
+        """,
+        (todo_id,)
+    )
+    row = cur.fetchone()
+    if row is not None:
+        _bump_revision(cur)
+        _enqueue_event(cur, todo_event("deleted", row_to_todo(row)))
+    return row
+
+
+def _archive_done_todos(cur, older_than, limit):
+    cur.execute(
+        """
+        WITH moved AS (
+            DELETE FROM todos WHERE id IN (
+                SELECT id FROM todos
+                WHERE done AND done_at < now() - make_interval(secs => %s)
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, todo, done, done_at
+        )
+        INSERT INTO todos_archive (id, todo, done, done_at, reason)
+        SELECT id, todo, done, done_at, 'archived' FROM moved
+        RETURNING id, todo, done
+        """,
+        (older_than, limit)
+    )
+    rows = cur.fetchall()
+    if rows:
+        _bump_revision(cur)
+        _enqueue_event(cur, todo_batch_event("archived", [row_to_todo(row) for row in rows]))
+    return rows
+
+
+def _select_archived_todos(cur, limit, after=None, reason=None):
+    conditions = []
+    params = []
+    if reason is not None:
+        conditions.append("reason = %s")
+        params.append(reason)
+    if after is not None:
+        conditions.append("id > %s")
+        params.append(after)
+    query = "SELECT id, todo, done, reason, archived_at FROM todos_archive"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY id LIMIT %s"
+    params.append(limit)
+    cur.execute(query, params)
+    return cur.fetchall()
+
+
+def archived_row_to_todo(row):
+    return {"id": row[0], "todo": row[1], "done": row[2], "reason": row[3], "archived_at": row[4]}
+
+
+def make_etag(revision, *parts):
+    """Strong ETag for a representation of the todos table at a revision"""
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:12]
+    return f'"{revision}-{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Evaluate an If-None-Match header against an ETag"""
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+async def known_revision(use_cache):
+    """Current todo_revision, from memory while the cache is coherent"""
+    if use_cache and todo_cache.revision is not None:
+        return todo_cache.revision
+    generation = todo_cache.generation
+    revision = await db_pool.run(_current_revision)
+    if use_cache:
+        todo_cache.remember_revision(revision, generation)
+    return revision
+
+
+def _ping(cur):
+    cur.execute("SELECT 1")
+
+
 @app.get("/todos")
-async def get_todos():
-    """Get all todos from database"""
-    logger.info("Fetching all todos")
+async def get_todos(
+    limit: Optional[int] = Query(None, ge=1, le=TODOS_MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    done: Optional[bool] = None,
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$"),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Get todos from database, optionally filtered by done and paginated
+
+    Without a limit every matching todo is returned. With a limit, the cursor
+    for the next page is sent in the X-Next-Cursor header and passed back as
+    the after parameter. stream=ndjson or stream=json streams every matching
+    todo from a server-side cursor instead of building the list in memory.
+    Responses carry an ETag derived from todo_revision; a matching
+    If-None-Match is answered with 304 without reading the rows.
+    """
+    logger.info("Fetching todos (limit=%s, after=%s, done=%s, stream=%s)", limit, after, done, stream)
+    position = decode_cursor(after) if after is not None else None
+    if stream is not None:
+        return await stream_todos(stream, position, done)
+    cache_key = (limit, after, done)
+    use_cache = todo_cache_usable()
+    if use_cache:
+        cached = todo_cache.get(cache_key)
+        if cached is not None:
+            body, headers = cached
+            if etag_matches(if_none_match, headers["ETag"]):
+                return not_modified(headers["ETag"])
+            logger.info("Serving todos from cache")
+            return Response(content=body, media_type="application/json", headers=headers)
+    generation = todo_cache.generation
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT id, todo, done FROM todos ORDER BY done, id")
-        rows = cur.fetchall()
-        cur.close()
-        conn.close()
-        todos = [{"id": row[0], "todo": row[1], "done": row[2]} for row in rows]
-        logger.info(f"Retrieved {len(todos)} todos")
-        return todos
+        if if_none_match is not None:
+            # Revalidation only needs the revision, not the rows
+            etag = make_etag(await known_revision(use_cache), *cache_key)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        # Fetch one extra row to know whether another page follows
+        revision, rows = await db_pool.run(_select_todos, limit + 1 if limit else None, position, done)
+        todos = [row_to_todo(row) for row in rows]
+        headers = {"ETag": make_etag(revision, *cache_key), "Cache-Control": "no-cache"}
+        if limit is not None and len(todos) > limit:
+            todos = todos[:limit]
+            headers["X-Next-Cursor"] = encode_cursor(todos[-1])
+        logger.info("Retrieved %d todos", len(todos))
+    except PoolTimeout:
+        raise
     except Exception as e:
         logger.error(f"Error fetching todos: {e}")
         raise HTTPException(status_code=500, detail="Database error")
+    body = orjson.dumps(todos)
+    if use_cache:
+        todo_cache.set(cache_key, body, headers, generation)
+        todo_cache.remember_revision(revision, generation)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def stream_todos(fmt, after, done):
+    """Stream todos as NDJSON lines or as a chunked JSON array"""
+    query, params = _todos_query(after=after, done=done)
+    batches = db_pool.stream(query, params, TODOS_STREAM_BATCH_SIZE)
+    # Pull the first batch up front so pool and query errors still map to a status code
+    try:
+        first = await batches.__anext__()
+    except StopAsyncIteration:
+        first = []
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming todos: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+
+    async def ndjson():
+        rows = first
+        while rows:
+            yield b"".join(orjson.dumps(row_to_todo(row), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+            rows = await anext(batches, [])
+
+    async def json_array():
+        yield b"["
+        rows = first
+        separator = b""
+        while rows:
+            yield separator + b",".join(orjson.dumps(row_to_todo(row)) for row in rows)
+            separator = b","
+            rows = await anext(batches, [])
+        yield b"]"
+
+    async def guarded(chunks):
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            # Headers are already sent, so the best we can do is cut the stream short
+            logger.error(f"Error streaming todos: {e}")
+        finally:
+            await batches.aclose()
+
+    if fmt == "ndjson":
+        return StreamingResponse(guarded(ndjson()), media_type="application/x-ndjson")
+    return StreamingResponse(guarded(json_array()), media_type="application/json")
+
+
+@app.get("/todos/search")
+async def search_todos(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=TODOS_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=TODOS_MAX_SEARCH_OFFSET),
+):
+    """Full-text search over todos, best matches first
+
+    q accepts web-search syntax ("quoted phrases", or, -excluded). When more
+    results follow, the offset of the next page is sent in X-Next-Offset.
+    Only the first TODOS_SEARCH_MAX_CANDIDATES matches are ranked.
+    """
+    logger.info("Searching todos for %r (limit=%d, offset=%d)", q, limit, offset)
+    try:
+        # Fetch one extra row to know whether another page follows
+        rows = await db_pool.run(_search_todos, q, limit + 1, offset)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching todos: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Offset"] = str(offset + limit)
+    return ORJSONResponse(content=[row_to_todo(row) for row in rows], headers=headers)
+
+
+@app.get("/todos/archived")
+async def get_archived_todos(
+    limit: int = Query(50, ge=1, le=TODOS_MAX_PAGE_SIZE),
+    after: Optional[int] = None,
+    reason: Optional[str] = Query(None, pattern="^(archived|deleted)$"),
+):
+    """List archived and deleted todos by id
+
+    When more follow, the id to pass as after is sent in X-Next-Cursor.
+    """
+    logger.info("Fetching archived todos (limit=%d, after=%s, reason=%s)", limit, after, reason)
+    try:
+        # Fetch one extra row to know whether another page follows
+        rows = await db_pool.run(_select_archived_todos, limit + 1, after, reason)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching archived todos: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+    headers = {}
+    if len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = str(rows[-1][0])
+    return ORJSONResponse(content=[archived_row_to_todo(row) for row in rows], headers=headers)
+
+
+@app.get("/todos/events")
+async def todo_events():
+    """Server-Sent Events feed of todo changes from every replica"""
+    client = todo_event_hub.subscribe()
+    if client is None:
+        raise HTTPException(status_code=503, detail="Too many event stream clients")
+
+    async def frames():
+        try:
+            # Tell the browser how long to wait before reconnecting
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(client.get(), timeout=SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    # Comment line keeps idle connections open through proxies
+                    yield b": keepalive\n\n"
+                    continue
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            todo_event_hub.unsubscribe(client)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/todos")
@@ -192,65 +1509,148 @@ async def create_todo(todo_data: TodoCreate):
         logger.warning(f"BLOCKED: Todo exceeds 140 characters - Length: {len(todo_data.todo)}")
         raise HTTPException(status_code=400, detail="Todo must be 140 characters or less")
     
-    logger.info(f"Creating todo: '{todo_data.todo[:50]}...' (length: {len(todo_data.todo)})")
+    logger.info("Creating todo: '%s...' (length: %d)", todo_data.todo[:50], len(todo_data.todo))
     
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "INSERT INTO todos (todo, done) VALUES (%s, FALSE) RETURNING id, todo, done",
-            (todo_data.todo,)
-        )
-        row = cur.fetchone()
-        conn.commit()
-        cur.close()
-        conn.close()
-        new_todo = {"id": row[0], "todo": row[1], "done": row[2]}
-        logger.info(f"SUCCESS: Created todo with id={new_todo['id']}")
+        row = await db_pool.run(_insert_todo, todo_data.todo)
+        new_todo = row_to_todo(row)
+        logger.info("SUCCESS: Created todo with id=%s", new_todo["id"])
         
-        # Publish event to NATS
-        await publish_todo_event("created", new_todo)
+        todo_cache.invalidate()
+        wake_outbox_relay()
         
         return new_todo
+    except PoolTimeout:
+        raise
     except Exception as e:
         logger.error(f"Error creating todo: {e}")
         raise HTTPException(status_code=500, detail="Database error")
 
 
+def check_bulk_size(items):
+    if len(items) > TODOS_MAX_BULK_SIZE:
+        logger.warning(f"BLOCKED: Bulk request with {len(items)} items exceeds {TODOS_MAX_BULK_SIZE}")
+        raise HTTPException(status_code=400, detail=f"At most {TODOS_MAX_BULK_SIZE} todos per request")
+
+
+@app.post("/todos/bulk")
+async def create_todos(todos_data: List[TodoCreate]):
+    """Create many todos in a single INSERT and transaction"""
+    check_bulk_size(todos_data)
+    if not todos_data:
+        return []
+    logger.info("Creating %d todos in bulk", len(todos_data))
+    try:
+        rows = await db_pool.run(_insert_todos, [item.todo for item in todos_data])
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating todos in bulk: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+    new_todos = [row_to_todo(row) for row in rows]
+    logger.info("SUCCESS: Created %d todos", len(new_todos))
+    todo_cache.invalidate()
+    wake_outbox_relay()
+
+    return ORJSONResponse(new_todos)
+
+
+@app.patch("/todos/bulk")
+async def update_todos(todos_data: List[TodoBulkUpdate]):
+    """Update the done status of many todos in a single UPDATE and transaction
+
+    Ids that do not exist are skipped; only the updated todos are returned.
+    """
+    check_bulk_size(todos_data)
+    # Last change wins if an id is repeated
+    changes = list({item.id: item.done for item in todos_data}.items())
+    if not changes:
+        return []
+    logger.info("Updating %d todos in bulk", len(changes))
+    try:
+        rows = await db_pool.run(_update_todos_done, changes)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating todos in bulk: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+    updated_todos = [row_to_todo(row) for row in rows]
+    logger.info("SUCCESS: Updated %d of %d todos", len(updated_todos), len(changes))
+    if updated_todos:
+        todo_cache.invalidate()
+        wake_outbox_relay()
+
+    return ORJSONResponse(updated_todos)
+
+
+@app.get("/todos/{todo_id:int}")
+async def get_todo(todo_id: int, if_none_match: Optional[str] = Header(None)):
+    """Get a single todo, honouring If-None-Match"""
+    use_cache = todo_cache_usable()
+    try:
+        if if_none_match is not None:
+            etag = make_etag(await known_revision(use_cache), "item", todo_id)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        generation = todo_cache.generation
+        revision, row = await db_pool.run(_select_todo, todo_id)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching todo {todo_id}: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+    if row is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    if use_cache:
+        todo_cache.remember_revision(revision, generation)
+    return ORJSONResponse(
+        content=row_to_todo(row),
+        headers={"ETag": make_etag(revision, "item", todo_id), "Cache-Control": "no-cache"}
+    )
+
+
 @app.put("/todos/{todo_id}")
 async def update_todo(todo_id: int, todo_data: TodoUpdate):
     """Update a todo's done status"""
-    logger.info(f"Updating todo {todo_id}: done={todo_data.done}")
+    logger.info("Updating todo %s: done=%s", todo_id, todo_data.done)
     
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute(
-            "UPDATE todos SET done = %s WHERE id = %s RETURNING id, todo, done",
-            (todo_data.done, todo_id)
-        )
-        row = cur.fetchone()
+        row = await db_pool.run(_update_todo_done, todo_id, todo_data.done)
         if row is None:
-            cur.close()
-            conn.close()
             raise HTTPException(status_code=404, detail="Todo not found")
-        conn.commit()
-        cur.close()
-        conn.close()
-        updated_todo = {"id": row[0], "todo": row[1], "done": row[2]}
-        logger.info(f"SUCCESS: Updated todo {todo_id} - done={updated_todo['done']}")
+        updated_todo = row_to_todo(row)
+        logger.info("SUCCESS: Updated todo %s - done=%s", todo_id, updated_todo["done"])
         
-        # Publish event to NATS
-        await publish_todo_event("updated", updated_todo)
+        todo_cache.invalidate()
+        wake_outbox_relay()
         
         return updated_todo
-    except HTTPException:
+    except (HTTPException, PoolTimeout):
         raise
     except Exception as e:
         logger.error(f"Error updating todo: {e}")
         raise HTTPException(status_code=500, detail="Database error")
 
 
+@app.delete("/todos/{todo_id}")
+async def delete_todo(todo_id: int):
+    """Soft-delete a todo by moving it to the archive; it stays listed under /todos/archived"""
+    logger.info("Deleting todo %s", todo_id)
+    try:
+        row = await db_pool.run(_delete_todo, todo_id)
+    except PoolTimeout:
+        raise
+    except Exception as e:
+        logger.error(f"Error deleting todo: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+    if row is None:
+        raise HTTPException(status_code=404, detail="Todo not found")
+    logger.info("SUCCESS: Deleted todo %s", todo_id)
+    todo_cache.invalidate()
+    wake_outbox_relay()
+    return ORJSONResponse(row_to_todo(row))
+
+
 @app.get("/")
 async def root():
     """Root endpoint for health checks"""
@@ -260,27 +1660,74 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    return {"status": "healthy", "nats": nats_publisher.stats()}
+
+
+def update_gauges():
+    LOGS_DROPPED.set(NonBlockingQueueHandler.dropped)
+    if db_pool is not None:
+        DB_POOL_IN_USE.set(db_pool.in_use)
+        DB_POOL_IDLE.set(db_pool.idle)
+    if nats_publisher is not None:
+        NATS_QUEUE_DEPTH.set(nats_publisher.queue_depth)
+    if todo_event_hub is not None:
+        SSE_CLIENTS.set(todo_event_hub.client_count)
+
+
+async def sample_gauges():
+    """Refresh gauges periodically so every worker's values reach /metrics"""
+    while True:
+        update_gauges()
+        await asyncio.sleep(METRICS_SAMPLE_INTERVAL)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint, aggregated across workers in multi-process mode"""
+    update_gauges()
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(content=generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.get("/healthz")
 async def readiness_check():
-    """Readiness probe - checks database connectivity"""
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT 1")
-        cur.close()
-        conn.close()
-        return {"status": "ready", "database": "connected"}
-    except Exception as e:
-        logger.error(f"Readiness check failed: {e}")
-        raise HTTPException(status_code=500, detail=f"Database connection failed: {e}")
+    """Readiness probe - answers from the background database check and live pool load"""
+    ready, body = readiness.status()
+    return ORJSONResponse(status_code=200 if ready else 503, content=body)
 
 
 if __name__ == "__main__":
     logger.info("Starting ToDo Backend...")
-    init_db()
+    if MIGRATE_ON_START and run_migrations() != 0:
+        sys.exit(1)
     port = int(os.getenv("PORT", 3000))
-    logger.info(f"Server started in port {port}")
-    uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
+    logger.info(f"Server started in port {port} with {WEB_CONCURRENCY} worker(s)")
+    if WEB_CONCURRENCY > 1:
+        # Workers import "main:app" themselves; exec the uvicorn CLI so this
+        # script is not also re-imported as __mp_main__ in every worker. The
+        # metrics directory must be in their environment before they start.
+        if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+            os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="todo-backend-metrics-")
+        # exec skips atexit, so drain queued log records first
+        log_listener.stop()
+        os.execv(sys.executable, [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "0.0.0.0",
+            "--port", str(port),
+            "--workers", str(WEB_CONCURRENCY),
+            "--log-level", "info",
+            "--no-access-log",
+            "--timeout-graceful-shutdown", str(GRACEFUL_SHUTDOWN_TIMEOUT),
+        ])
+    # Requests are already logged by log_requests, so skip uvicorn's synchronous access log
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=port,
+        log_level="info",
+        access_log=False,
+        timeout_graceful_shutdown=GRACEFUL_SHUTDOWN_TIMEOUT,
+    )
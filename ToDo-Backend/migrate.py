@@ -0,0 +1,226 @@
+import os
+import sys
+import time
+import logging
+import psycopg2
+from psycopg2 import sql
+
+logger = logging.getLogger("migrate")
+
+# Database configuration
+DB_HOST = os.getenv("DB_HOST", "todo-postgres-svc")
+DB_PORT = os.getenv("DB_PORT", "5432")
+DB_NAME = os.getenv("DB_NAME", "tododb")
+DB_USER = os.getenv("DB_USER", "todouser")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "todopassword")
+
+# Give up on a DDL lock instead of queueing every query behind it
+MIGRATION_LOCK_TIMEOUT = os.getenv("MIGRATION_LOCK_TIMEOUT", "5s")
+# Arbitrary key so concurrent runners (several pods, a job) take turns
+MIGRATION_ADVISORY_LOCK = 7243001
+
+
+class Migration:
+    """One schema step; non-transactional steps run in autocommit mode
+
+    indexes names the indexes a step builds CONCURRENTLY. A failed concurrent
+    build leaves an INVALID index that IF NOT EXISTS would skip, so these are
+    dropped before the step runs and checked for validity after it.
+    """
+
+    def __init__(self, version, description, statements, transactional=True, indexes=()):
+        self.version = version
+        self.description = description
+        self.statements = statements
+        self.transactional = transactional
+        self.indexes = indexes
+
+
+MIGRATIONS = [
+    Migration(1, "create todos table", [
+        """
+        CREATE TABLE IF NOT EXISTS todos (
+            id SERIAL PRIMARY KEY,
+            todo VARCHAR(140) NOT NULL,
+            done BOOLEAN NOT NULL DEFAULT FALSE
+        )
+        """,
+        # Databases created before the done column existed
+        "ALTER TABLE todos ADD COLUMN IF NOT EXISTS done BOOLEAN NOT NULL DEFAULT FALSE",
+    ]),
+    Migration(2, "create todo_revision counter", [
+        """
+        CREATE TABLE IF NOT EXISTS todo_revision (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            revision BIGINT NOT NULL DEFAULT 0
+        )
+        """,
+        "INSERT INTO todo_revision (id, revision) VALUES (1, 0) ON CONFLICT (id) DO NOTHING",
+    ]),
+    Migration(3, "create todo_outbox table", [
+        """
+        CREATE TABLE IF NOT EXISTS todo_outbox (
+            id BIGSERIAL PRIMARY KEY,
+            payload TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            claimed_until TIMESTAMPTZ
+        )
+        """,
+    ]),
+    Migration(4, "index todos on (done, id)", [
+        # CONCURRENTLY keeps the table writable while the index builds
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS todos_done_id_idx ON todos (done, id)",
+    ], transactional=False, indexes=["todos_done_id_idx"]),
+    Migration(5, "full-text search index on todos", [
+        # Expression index, so no column is added and the table is not rewritten;
+        # queries must use the same to_tsvector('english', todo) expression
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS todos_search_idx ON todos USING GIN (to_tsvector('english', todo))",
+    ], transactional=False, indexes=["todos_search_idx"]),
+    Migration(6, "done_at column and todos_archive table", [
+        # Nullable with no default, so adding it does not rewrite the table
+        "ALTER TABLE todos ADD COLUMN IF NOT EXISTS done_at TIMESTAMPTZ",
+        # Rows done before this column existed start their archival clock now
+        "UPDATE todos SET done_at = now() WHERE done AND done_at IS NULL",
+        """
+        CREATE TABLE IF NOT EXISTS todos_archive (
+            id INTEGER PRIMARY KEY,
+            todo VARCHAR(140) NOT NULL,
+            done BOOLEAN NOT NULL,
+            done_at TIMESTAMPTZ,
+            archived_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            reason TEXT NOT NULL CHECK (reason IN ('archived', 'deleted'))
+        )
+        """,
+    ]),
+    Migration(7, "stored search_vector column on todos", [
+        # Nullable with no default, so adding it does not rewrite the table;
+        # ranking reads the stored vector instead of re-parsing every match
+        "ALTER TABLE todos ADD COLUMN IF NOT EXISTS search_vector tsvector",
+        """
+        CREATE OR REPLACE FUNCTION todos_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := to_tsvector('english', NEW.todo);
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        "DROP TRIGGER IF EXISTS todos_search_vector_update ON todos",
+        """
+        CREATE TRIGGER todos_search_vector_update
+        BEFORE INSERT OR UPDATE OF todo ON todos
+        FOR EACH ROW EXECUTE FUNCTION todos_search_vector_update()
+        """,
+        "UPDATE todos SET search_vector = to_tsvector('english', todo) WHERE search_vector IS NULL",
+    ]),
+    Migration(8, "full-text search index on search_vector", [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS todos_search_vector_idx ON todos USING GIN (search_vector)",
+        # Replaced by the index above
+        "DROP INDEX CONCURRENTLY IF EXISTS todos_search_idx",
+    ], transactional=False, indexes=["todos_search_vector_idx"]),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def get_db_connection():
+    """Get database connection"""
+    return psycopg2.connect(
+        host=DB_HOST,
+        port=DB_PORT,
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD
+    )
+
+
+def current_version(cur):
+    """Highest applied schema version, 0 for an unversioned database"""
+    cur.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cur.fetchone()[0]
+
+
+def index_is_valid(cur, name):
+    """pg_index.indisvalid for an index, None when it does not exist"""
+    cur.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+    row = cur.fetchone()
+    return None if row is None else row[0]
+
+
+def apply(conn, migration):
+    logger.info(f"Applying migration {migration.version}: {migration.description}")
+    started = time.time()
+    conn.autocommit = not migration.transactional
+    with conn.cursor() as cur:
+        cur.execute("SET lock_timeout = %s", (MIGRATION_LOCK_TIMEOUT,))
+        for name in migration.indexes:
+            if index_is_valid(cur, name) is False:
+                logger.warning(f"Dropping invalid index {name} left by an interrupted build")
+                cur.execute(sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name)))
+        for statement in migration.statements:
+            cur.execute(statement)
+        for name in migration.indexes:
+            if not index_is_valid(cur, name):
+                raise RuntimeError(f"Index {name} is missing or invalid after migration {migration.version}")
+        cur.execute(
+            "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+            (migration.version, migration.description)
+        )
+    if migration.transactional:
+        conn.commit()
+    conn.autocommit = True
+    logger.info(f"Applied migration {migration.version} in {time.time() - started:.2f}s")
+
+
+def migrate():
+    """Apply every pending migration under an advisory lock"""
+    conn = get_db_connection()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_ADVISORY_LOCK,))
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """)
+            version = current_version(cur)
+        pending = [m for m in MIGRATIONS if m.version > version]
+        if not pending:
+            logger.info(f"Schema is up to date at version {version}")
+            return
+        for migration in pending:
+            apply(conn, migration)
+        logger.info(f"Schema migrated from version {version} to {LATEST_SCHEMA_VERSION}")
+    finally:
+        # Closing the session also releases the advisory lock
+        conn.close()
+
+
+def main():
+    """Run migrations, retrying while the database is still starting"""
+    retries = 10
+    while retries > 0:
+        try:
+            migrate()
+            return 0
+        except psycopg2.OperationalError as e:
+            logger.warning(f"Database connection failed, retrying... ({e})")
+            retries -= 1
+            time.sleep(2)
+    logger.error("Failed to migrate database")
+    return 1
+
+
+if __name__ == "__main__":
+    # Configure logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler(sys.stdout)]
+    )
+    sys.exit(main())